@@ -1,30 +1,35 @@
 # ===============================
 # File: 2-transactional.py
 # ===============================
-import sqlite3
 import functools
+from db_pool import pooled_connection
+from query_cache import WriteTracker, invalidate_writes, shared_cache
 
 def with_db_connection(func):
     @functools.wraps(func)
     def wrapper(*args, **kwargs):
-        conn = sqlite3.connect('users.db')
-        try:
+        # Borrowed from the pool instead of connect/close on every call
+        with pooled_connection('users.db') as conn:
             return func(conn, *args, **kwargs)
-        finally:
-            conn.close()
     return wrapper
 
 def transactional(func):
     @functools.wraps(func)
     def wrapper(conn, *args, **kwargs):
+        # Record the tables written so their cached reads can be dropped
+        tracker = WriteTracker()
+        conn.set_trace_callback(tracker)
         try:
             result = func(conn, *args, **kwargs)
             conn.commit()
-            return result
         except Exception as e:
             conn.rollback()
             print(f"Transaction failed: {e}")
             raise
+        finally:
+            conn.set_trace_callback(None)
+        invalidate_writes(shared_cache, conn, tracker.tables)
+        return result
     return wrapper
 
 @with_db_connection
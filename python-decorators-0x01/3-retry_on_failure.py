@@ -2,17 +2,15 @@
 # File: 3-retry_on_failure.py
 # ===============================
 import time
-import sqlite3
 import functools
+from db_pool import pooled_connection
 
 def with_db_connection(func):
     @functools.wraps(func)
     def wrapper(*args, **kwargs):
-        conn = sqlite3.connect('users.db')
-        try:
+        # Borrowed from the pool instead of connect/close on every call
+        with pooled_connection('users.db') as conn:
             return func(conn, *args, **kwargs)
-        finally:
-            conn.close()
     return wrapper
 
 def retry_on_failure(retries=3, delay=2):
@@ -1,32 +1,55 @@
 # ===============================
 # File: 4-cache_query.py
 # ===============================
-import sqlite3
 import functools
+from db_pool import pooled_connection
+from query_cache import (MISSING, database_path, make_key, read_tags,
+                         shared_cache)
 
-query_cache = {}
+# Bounded LRU with per-entry TTL, shared by every @cache_query function;
+# @transactional commits drop the entries that read the tables they wrote
+query_cache = shared_cache
 
 def with_db_connection(func):
     @functools.wraps(func)
     def wrapper(*args, **kwargs):
-        conn = sqlite3.connect('users.db')
-        try:
+        # Borrowed from the pool instead of connect/close on every call
+        with pooled_connection('users.db') as conn:
             return func(conn, *args, **kwargs)
-        finally:
-            conn.close()
     return wrapper
 
-def cache_query(func):
-    @functools.wraps(func)
-    def wrapper(conn, *args, **kwargs):
-        query = kwargs.get('query')
-        if query in query_cache:
-            print("Returning cached result")
-            return query_cache[query]
-        result = func(conn, *args, **kwargs)
-        query_cache[query] = result
-        return result
-    return wrapper
+def cache_query(func=None, *, cache=query_cache, ttl=MISSING, stale=0):
+    """Cache results keyed on (database, query, params).
+
+    Usable bare (@cache_query) or configured (@cache_query(ttl=60)).
+    Entries are tagged with the tables the query reads, so writes made
+    through @transactional invalidate them. Concurrent misses for one key
+    run the query once and share the rows; stale=N keeps serving an
+    expired entry for N more seconds while one caller refreshes it.
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(conn, *args, **kwargs):
+            if 'query' in kwargs:
+                query, rest = kwargs['query'], args
+            else:
+                query, rest = (args[0], args[1:]) if args else (None, ())
+            # Every other argument (e.g. params) is part of the key too
+            params = rest + tuple(sorted(
+                (name, value) for name, value in kwargs.items()
+                if name != 'query'))
+            db_path = database_path(conn)
+            key = make_key(query, params, db_path)
+            if key is None:
+                return func(conn, *args, **kwargs)
+            result, status = cache.get_or_compute(
+                key, lambda: func(conn, *args, **kwargs), ttl,
+                tags=read_tags(db_path, query), stale=stale)
+            if status != 'miss':
+                print("Returning cached result")
+            return result
+        return wrapper
+    return decorator(func) if func is not None else decorator
 
 @with_db_connection
 @cache_query
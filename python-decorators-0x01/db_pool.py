@@ -0,0 +1,175 @@
+# ===============================
+# File: db_pool.py
+# ===============================
+import os
+import queue
+import sqlite3
+import threading
+from contextlib import contextmanager
+from functools import partial
+from statements import STATEMENT_CACHE_SIZE, TrackingConnection
+
+DB_PATH = 'users.db'
+
+# Applied once when a connection is opened, not on every checkout
+SQLITE_PRAGMAS = (
+    "PRAGMA journal_mode = WAL",
+    "PRAGMA synchronous = NORMAL",
+    "PRAGMA mmap_size = 268435456",
+    "PRAGMA cache_size = -16384",
+    "PRAGMA busy_timeout = 5000",
+)
+
+
+class PoolTimeout(Exception):
+    """Raised when no connection frees up within the pool timeout"""
+
+
+def connect_sqlite(path=DB_PATH, pragmas=SQLITE_PRAGMAS, **options):
+    """Open a SQLite connection with the pool's pragmas applied.
+
+    The connection keeps up to STATEMENT_CACHE_SIZE compiled statements,
+    so a repeated query on a pooled connection skips parse and plan.
+    """
+    options.setdefault('factory', TrackingConnection)
+    options.setdefault('cached_statements', STATEMENT_CACHE_SIZE)
+    conn = sqlite3.connect(path, **options)
+    for pragma in pragmas:
+        conn.execute(pragma)
+    return conn
+
+
+def _reset(conn):
+    """Return a connection to a clean state before it is reused"""
+    if getattr(conn, 'in_transaction', False):
+        conn.rollback()
+    if isinstance(conn, sqlite3.Connection):
+        conn.row_factory = None
+
+
+class ThreadLocalPool:
+    """Per-thread reuse of SQLite connections.
+
+    sqlite3 connections belong to the thread that opened them, so each
+    thread keeps its own idle connections (up to `idle` of them; nested
+    checkouts in one thread get separate connections).
+    """
+
+    def __init__(self, connect, idle=2):
+        self._connect = connect
+        self._idle = idle
+        self._local = threading.local()
+
+    def _stack(self):
+        stack = getattr(self._local, 'stack', None)
+        if stack is None:
+            stack = self._local.stack = []
+        return stack
+
+    def acquire(self):
+        stack = self._stack()
+        return stack.pop() if stack else self._connect()
+
+    def release(self, conn, discard=False):
+        stack = self._stack()
+        if discard or len(stack) >= self._idle:
+            conn.close()
+        else:
+            stack.append(conn)
+
+    def close(self):
+        """Close the calling thread's idle connections"""
+        stack = self._stack()
+        while stack:
+            stack.pop().close()
+
+
+class BoundedPool:
+    """At most `size` connections shared between threads.
+
+    For server databases whose connections may cross threads. Borrowers
+    wait up to `timeout` seconds for a free connection, then PoolTimeout.
+    """
+
+    def __init__(self, connect, size=5, timeout=30.0):
+        self._connect = connect
+        self._timeout = timeout
+        self._idle = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(size)
+
+    def acquire(self):
+        if not self._slots.acquire(timeout=self._timeout):
+            raise PoolTimeout(f"No connection free after {self._timeout}s")
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        try:
+            return self._connect()
+        except Exception:
+            self._slots.release()
+            raise
+
+    def release(self, conn, discard=False):
+        try:
+            if discard:
+                conn.close()
+            else:
+                self._idle.put(conn)
+        finally:
+            self._slots.release()
+
+    def close(self):
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                return
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def configure_pool(name, pool):
+    """Register the pool used for `name` (a SQLite path or any label)"""
+    with _pools_lock:
+        previous = _pools.get(name)
+        _pools[name] = pool
+    if previous is not None:
+        previous.close()
+
+
+def get_pool(name=DB_PATH):
+    """The pool for name; SQLite files get a ThreadLocalPool by default.
+
+    DB_POOL=bounded switches the default to a BoundedPool of
+    DB_POOL_SIZE connections (opened with check_same_thread=False).
+    """
+    with _pools_lock:
+        pool = _pools.get(name)
+        if pool is None:
+            if os.getenv('DB_POOL', 'thread') == 'bounded':
+                pool = BoundedPool(
+                    partial(connect_sqlite, name, check_same_thread=False),
+                    size=int(os.getenv('DB_POOL_SIZE', '5')))
+            else:
+                pool = ThreadLocalPool(partial(connect_sqlite, name))
+            _pools[name] = pool
+        return pool
+
+
+@contextmanager
+def pooled_connection(name=DB_PATH):
+    """Borrow a connection; it is rolled back and reset on the way back"""
+    pool = get_pool(name)
+    conn = pool.acquire()
+    discard = False
+    try:
+        yield conn
+    finally:
+        try:
+            _reset(conn)
+        except Exception:
+            discard = True
+        pool.release(conn, discard)
@@ -0,0 +1,429 @@
+# ===============================
+# File: query_cache.py
+# ===============================
+import re
+import sys
+import threading
+import time
+from collections import OrderedDict
+
+MISSING = object()
+
+# Tag meaning "any table": every entry carries it, and a write whose
+# tables can't be worked out invalidates it
+ANY_TABLE = '*'
+# Tag for reads whose tables couldn't be parsed; any write drops them
+UNKNOWN_TABLES = '?'
+
+# Comments are matched as tokens (after quoted literals, so a '--' inside
+# a string stays part of it) and then dropped
+_TOKEN = re.compile(r"""'(?:[^']|'')*'|"[^"]*"|`[^`]*`|\[[^\]]*\]"""
+                    r"""|--[^\n]*|/\*.*?(?:\*/|$)"""
+                    r"""|\w+(?:\.\w+)*|[(),;]""", re.S)
+_CLAUSES = {'WHERE', 'GROUP', 'ORDER', 'LIMIT', 'HAVING', 'UNION',
+            'EXCEPT', 'INTERSECT', 'WINDOW', 'ON', 'USING', 'SELECT',
+            'VALUES', 'RETURNING'}
+# Statements that change no table rows; any other leading keyword the
+# parser doesn't know is treated as a write to unknown tables
+_NON_WRITES = {'SELECT', 'VALUES', 'BEGIN', 'COMMIT', 'END', 'ROLLBACK',
+               'SAVEPOINT', 'RELEASE', 'PRAGMA', 'EXPLAIN', 'ANALYZE',
+               'VACUUM', 'ATTACH', 'DETACH', 'REINDEX'}
+
+
+def estimate_size(value):
+    """Rough byte size of a query result (list of row tuples)"""
+    size = sys.getsizeof(value)
+    if isinstance(value, (list, tuple)):
+        for row in value:
+            size += sys.getsizeof(row)
+            if isinstance(row, (list, tuple)):
+                size += sum(sys.getsizeof(field) for field in row)
+    return size
+
+
+def make_key(query, params=(), db_path=None):
+    """Cache key from the database, the SQL text and its bound parameters.
+
+    Returns None when the parameters can't be hashed; such calls are not
+    cached.
+    """
+    if isinstance(params, dict):
+        params = tuple(sorted(params.items()))
+    elif params is not None:
+        params = tuple(params)
+    key = (db_path, query, params)
+    try:
+        hash(key)
+    except TypeError:
+        return None
+    return key
+
+
+def _tokens(sql):
+    return [token for token in _TOKEN.findall(sql)
+            if not token.startswith(('--', '/*'))]
+
+
+def _table_name(token):
+    """Bare lower-case table name: quotes and schema prefix removed"""
+    return token.strip('`"[]').split('.')[-1].lower()
+
+
+def _is_name(token):
+    return token[0] not in "'(),;" and not token[0].isdigit()
+
+
+def tables_read(sql):
+    """Tables a SELECT reads, from its FROM lists and JOINs.
+
+    Returns None if the statement names none it can recognise, so the
+    caller can treat it as depending on every table.
+    """
+    tables = set()
+    expect = in_from = False
+    for token in _tokens(sql):
+        upper = token.upper()
+        if upper in ('FROM', 'JOIN'):
+            expect, in_from = True, upper == 'FROM'
+        elif expect:
+            expect = False
+            if _is_name(token) and upper not in _CLAUSES:
+                tables.add(_table_name(token))
+        elif token == ',' and in_from:
+            expect = True
+        elif token in ('(', ')') or upper in _CLAUSES:
+            in_from = False
+    return tables or None
+
+
+def tables_written(sql):
+    """Tables an INSERT/REPLACE/UPDATE/DELETE or table DDL writes.
+
+    Returns an empty set for statements that write nothing (SELECT,
+    BEGIN, COMMIT, CREATE INDEX...) and None when it may be a write but
+    the table can't be identified, e.g. the trace of a trigger body or a
+    statement the parser doesn't recognise.
+    """
+    tokens = [token for token in _tokens(sql) if token != ';']
+    if not tokens:
+        # sqlite3 traces trigger-body statements as '-- ...' lines
+        return None if sql.lstrip().startswith('--') else set()
+    words = [token.upper() for token in tokens]
+    verb = words[0]
+    if verb == 'WITH':
+        verbs = [i for i, word in enumerate(words)
+                 if word in ('INSERT', 'REPLACE', 'UPDATE', 'DELETE')]
+        if not verbs:
+            return set()
+        tokens, words = tokens[verbs[0]:], words[verbs[0]:]
+        verb = words[0]
+    if verb in ('INSERT', 'REPLACE'):
+        marker = 'INTO'
+    elif verb == 'DELETE':
+        marker = 'FROM'
+    elif verb in ('ALTER', 'DROP', 'CREATE'):
+        kinds = [word for word in words[:3] if word in ('TABLE', 'VIEW')]
+        if not kinds:
+            return set()  # indexes and triggers change no rows
+        marker = kinds[0]
+    elif verb == 'UPDATE':
+        position = 3 if len(words) > 2 and words[1] == 'OR' else 1
+        if position < len(tokens) and _is_name(tokens[position]):
+            return {_table_name(tokens[position])}
+        return None
+    elif verb in _NON_WRITES:
+        return set()
+    else:
+        return None
+    if marker not in words:
+        return None
+    rest = [token for token, word in zip(tokens, words)
+            if word not in ('IF', 'NOT', 'EXISTS')][words.index(marker) + 1:]
+    if rest and _is_name(rest[0]):
+        return {_table_name(rest[0])}
+    return None
+
+
+def read_tags(db_path, sql):
+    """Invalidation tags for a cached SELECT against db_path.
+
+    sql may be anything a @cache_query function takes first (an id, or
+    nothing at all); only strings are parsed, the rest depend on every
+    table.
+    """
+    tables = tables_read(sql) if isinstance(sql, str) else None
+    names = tables if tables else {UNKNOWN_TABLES}
+    return {(db_path, name) for name in names | {ANY_TABLE}}
+
+
+def write_tags(db_path, tables):
+    """Tags to invalidate after writing `tables` (None: unknown tables)"""
+    if tables is None:
+        return {(db_path, ANY_TABLE)}
+    return {(db_path, name) for name in set(tables) | {UNKNOWN_TABLES}}
+
+
+def database_path(conn):
+    """File behind a sqlite3 connection's main database ('' if in memory)
+
+    Looked up once per connection and kept on it, so cache hits on a
+    pooled connection don't run PRAGMA database_list every call.
+    """
+    path = getattr(conn, 'database_path', None)
+    if path is not None:
+        return path
+    for _, name, path in conn.execute("PRAGMA database_list"):
+        if name == 'main':
+            try:
+                conn.database_path = path
+            except AttributeError:
+                pass  # a plain sqlite3.Connection takes no attributes
+            return path
+    return None
+
+
+class WriteTracker:
+    """sqlite3 trace callback collecting the tables a connection writes.
+
+    Install with conn.set_trace_callback(tracker). `tables` is None once a
+    write to an unidentified table has been seen.
+    """
+
+    def __init__(self):
+        self.tables = set()
+
+    def __call__(self, sql):
+        if self.tables is None:
+            return
+        written = tables_written(sql)
+        if written is None:
+            self.tables = None
+        else:
+            self.tables |= written
+
+
+def invalidate_writes(cache, conn, tables):
+    """Drop cache entries that read any of `tables` on conn's database.
+
+    Triggers run inside the traced statement, so writes to a table with
+    triggers invalidate everything cached for that database.
+    """
+    if tables is not None:
+        if not tables:
+            return 0
+        marks = ', '.join('?' * len(tables))
+        triggered = conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'trigger' "
+            f"AND lower(tbl_name) IN ({marks}) LIMIT 1",
+            tuple(tables)).fetchone()
+        if triggered:
+            tables = None
+    return cache.invalidate_tags(write_tags(database_path(conn), tables))
+
+
+class _Flight:
+    """One in-progress computation that concurrent misses wait on"""
+
+    def __init__(self, tags):
+        self.tags = tags
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+
+
+class QueryCache:
+    """Thread-safe LRU cache of query results.
+
+    Bounded both by entry count and by the estimated bytes of the cached
+    results; the least recently used entries are evicted first. Each entry
+    expires `ttl` seconds after it was stored (None means never).
+
+    Entries can carry tags (see read_tags); invalidate_tags drops every
+    entry holding one of them. A result computed before such an
+    invalidation is refused by set(since=...), so a slow reader can't put
+    back rows that a concurrent write has already made stale.
+
+    get_or_compute adds single-flight misses: concurrent callers of one
+    key share a single computation. It can also serve expired entries
+    for a grace period while one caller refreshes them.
+    """
+
+    def __init__(self, max_entries=256, max_bytes=16 * 1024 * 1024,
+                 ttl=300.0):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        # key -> (value, size, expires_at, tags)
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._tagged = {}  # tag -> keys holding it
+        self._invalidated = {}  # tag -> generation it was last dropped at
+        self._generation = 0
+        self._flights = {}  # key -> _Flight being computed
+        self._lock = threading.RLock()
+        self.hits = self.misses = self.evictions = self.expirations = 0
+        self.invalidations = self.coalesced = self.stale_hits = 0
+
+    def get(self, key):
+        """Return the cached value for key, or MISSING"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return MISSING
+            value, _, expires_at, _ = entry
+            if expires_at is not None and time.monotonic() >= expires_at:
+                self._remove(key)
+                self.expirations += 1
+                self.misses += 1
+                return MISSING
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def get_or_compute(self, key, compute, ttl=MISSING, tags=(), stale=0):
+        """Return (value, status) for key, calling compute() on a miss.
+
+        status is 'hit', 'miss' (this caller ran compute), 'shared' (it
+        waited for another thread's compute of the same key) or 'stale'.
+        With stale > 0 an entry up to `stale` seconds past its expiry is
+        still served while the first caller to see it expired refreshes
+        it inline; stale-while-revalidate without a background thread, so
+        compute can keep using the caller's connection.
+        """
+        tags = frozenset(tags)
+        with self._lock:
+            entry = self._entries.get(key)
+            flight = self._flights.get(key)
+            if entry is not None:
+                value, _, expires_at, _ = entry
+                now = time.monotonic()
+                if expires_at is None or now < expires_at:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return value, 'hit'
+                if now < expires_at + stale and flight is not None:
+                    self.stale_hits += 1
+                    return value, 'stale'
+                if now >= expires_at + stale:
+                    self._remove(key)
+                    self.expirations += 1
+            if flight is not None:
+                self.coalesced += 1
+                leader = False
+            else:
+                self.misses += 1
+                flight = self._flights[key] = _Flight(tags)
+                leader = True
+                generation = self._generation
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.value, 'shared'
+        try:
+            flight.value = compute()
+        except BaseException as err:
+            flight.error = err
+            raise
+        else:
+            self.set(key, flight.value, ttl, tags, since=generation)
+        finally:
+            with self._lock:
+                if self._flights.get(key) is flight:
+                    del self._flights[key]
+            flight.done.set()
+        return flight.value, 'miss'
+
+    def generation(self):
+        """Pass to set(since=...) when starting to compute a value"""
+        with self._lock:
+            return self._generation
+
+    def set(self, key, value, ttl=MISSING, tags=(), since=None):
+        """Store value under key; ttl overrides the cache default.
+
+        Nothing is stored if one of `tags` was invalidated after
+        generation `since`.
+        """
+        ttl = self.ttl if ttl is MISSING else ttl
+        size = estimate_size(value)
+        if size > self.max_bytes:
+            return
+        expires_at = None if ttl is None else time.monotonic() + ttl
+        tags = frozenset(tags)
+        with self._lock:
+            if since is not None and any(
+                    self._invalidated.get(tag, -1) > since for tag in tags):
+                return
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (value, size, expires_at, tags)
+            self._bytes += size
+            for tag in tags:
+                self._tagged.setdefault(tag, set()).add(key)
+            while (len(self._entries) > self.max_entries
+                   or self._bytes > self.max_bytes):
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+    def _remove(self, key):
+        _, size, _, tags = self._entries.pop(key)
+        self._bytes -= size
+        for tag in tags:
+            keys = self._tagged[tag]
+            keys.discard(key)
+            if not keys:
+                del self._tagged[tag]
+
+    def invalidate_tags(self, tags):
+        """Drop every entry carrying any of tags; returns how many"""
+        dropped = 0
+        with self._lock:
+            self._generation += 1
+            for tag in tags:
+                self._invalidated[tag] = self._generation
+                for key in list(self._tagged.get(tag, ())):
+                    self._remove(key)
+                    dropped += 1
+            # Later callers must not join a computation that started
+            # before this invalidation
+            for key, flight in list(self._flights.items()):
+                if not flight.tags.isdisjoint(tags):
+                    del self._flights[key]
+            self.invalidations += dropped
+        return dropped
+
+    def invalidate(self, key):
+        """Drop one entry if present"""
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._tagged.clear()
+            self._bytes = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def stats(self):
+        """Counters plus current size, for monitoring"""
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+                'invalidations': self.invalidations,
+                'coalesced': self.coalesced,
+                'stale_hits': self.stale_hits,
+            }
+
+
+# Shared by @cache_query and invalidated by @transactional commits
+shared_cache = QueryCache()
@@ -0,0 +1,102 @@
+# ===============================
+# File: statements.py
+# ===============================
+import os
+import re
+import sqlite3
+import threading
+import time
+from functools import lru_cache
+
+# Compiled statements sqlite3 keeps per connection (an LRU keyed on the
+# exact SQL text); pooled connections keep them warm across calls
+STATEMENT_CACHE_SIZE = int(os.getenv('DB_STATEMENT_CACHE', '256'))
+
+_COMMENTS = re.compile(r"--[^\n]*|/\*.*?\*/", re.S)
+_LITERALS = re.compile(
+    r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b|\?\d*|:\w+|@\w+|\$\w+")
+_IN_LIST = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+
+
+@lru_cache(maxsize=1024)
+def fingerprint(sql):
+    """Statement shape: literals and placeholders become ?, IN lists (...)
+
+    Queries differing only in values, whitespace or comments share a
+    fingerprint, e.g. "SELECT * FROM users WHERE id = ?".
+    """
+    sql = _COMMENTS.sub(' ', sql)
+    sql = _LITERALS.sub('?', sql)
+    sql = _IN_LIST.sub('(...)', sql)
+    return ' '.join(sql.split())
+
+
+class StatementStats:
+    """Calls and execution time aggregated per statement fingerprint"""
+
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._shapes = {}  # fingerprint -> [calls, seconds, max_seconds]
+
+    def record(self, sql, seconds):
+        shape = fingerprint(sql)
+        with self._lock:
+            entry = self._shapes.get(shape)
+            if entry is None:
+                entry = self._shapes[shape] = [0, 0.0, 0.0]
+            entry[0] += 1
+            entry[1] += seconds
+            if seconds > entry[2]:
+                entry[2] = seconds
+
+    def snapshot(self):
+        """{fingerprint: {'calls', 'seconds', 'max_seconds'}}"""
+        with self._lock:
+            return {shape: {'calls': calls, 'seconds': seconds,
+                            'max_seconds': slowest}
+                    for shape, (calls, seconds, slowest)
+                    in self._shapes.items()}
+
+    def reset(self):
+        with self._lock:
+            self._shapes.clear()
+
+
+# Opt in with DB_STATEMENT_STATS=1 or statement_stats.enabled = True
+statement_stats = StatementStats(enabled=bool(os.getenv('DB_STATEMENT_STATS')))
+
+
+class TrackingCursor(sqlite3.Cursor):
+    """Cursor that times each statement into statement_stats when enabled"""
+
+    def execute(self, sql, parameters=()):
+        if not statement_stats.enabled:
+            return super().execute(sql, parameters)
+        start = time.perf_counter()
+        try:
+            return super().execute(sql, parameters)
+        finally:
+            statement_stats.record(sql, time.perf_counter() - start)
+
+    def executemany(self, sql, seq_of_parameters):
+        if not statement_stats.enabled:
+            return super().executemany(sql, seq_of_parameters)
+        start = time.perf_counter()
+        try:
+            return super().executemany(sql, seq_of_parameters)
+        finally:
+            statement_stats.record(sql, time.perf_counter() - start)
+
+
+class TrackingConnection(sqlite3.Connection):
+    """sqlite3 connection whose cursors (and execute shortcuts) track stats"""
+
+    def cursor(self, factory=TrackingCursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
@@ -0,0 +1,465 @@
+#!/usr/bin/env python3
+"""Tests for the query cache engine and its table-based invalidation.
+"""
+import importlib
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+import unittest
+from unittest.mock import patch
+
+from query_cache import (
+    ANY_TABLE,
+    MISSING,
+    UNKNOWN_TABLES,
+    QueryCache,
+    WriteTracker,
+    database_path,
+    estimate_size,
+    read_tags,
+    shared_cache,
+    tables_read,
+    tables_written,
+)
+from statements import TrackingConnection
+
+
+class TestTablesRead(unittest.TestCase):
+    """Tests `tables_read`."""
+
+    def test_single_table(self) -> None:
+        """A plain SELECT reads its FROM table."""
+        self.assertEqual(tables_read("SELECT * FROM users"), {'users'})
+
+    def test_joins(self) -> None:
+        """JOINed tables are included, aliases are not."""
+        self.assertEqual(
+            tables_read("SELECT u.id FROM users u "
+                        "LEFT JOIN orders o ON o.user_id = u.id "
+                        "JOIN items i ON i.order_id = o.id"),
+            {'users', 'orders', 'items'})
+
+    def test_comma_joins(self) -> None:
+        """Every table of a comma-separated FROM list is included."""
+        self.assertEqual(
+            tables_read("SELECT a FROM t1, t2 AS b, t3 "
+                        "WHERE a IN (1, 2) ORDER BY a, b"),
+            {'t1', 't2', 't3'})
+
+    def test_subqueries(self) -> None:
+        """Tables inside subqueries count, derived tables do not."""
+        self.assertEqual(
+            tables_read("SELECT * FROM (SELECT id FROM users) s "
+                        "WHERE s.id IN (SELECT user_id FROM orders)"),
+            {'users', 'orders'})
+
+    def test_cte(self) -> None:
+        """The tables a CTE reads are included."""
+        tables = tables_read("WITH recent AS (SELECT * FROM orders) "
+                             "SELECT * FROM recent JOIN users "
+                             "ON users.id = recent.user_id")
+        self.assertTrue({'orders', 'users'} <= tables)
+
+    def test_schema_qualified_and_quoted(self) -> None:
+        """Schema prefixes and quotes are stripped, names lower-cased."""
+        self.assertEqual(
+            tables_read('SELECT * FROM main.Users JOIN "orders" '
+                        'ON 1 JOIN [log] ON 1 JOIN `items` ON 1'),
+            {'users', 'orders', 'log', 'items'})
+
+    def test_comments(self) -> None:
+        """Comments are skipped; '--' inside a string literal is not one."""
+        for sql in ("SELECT * FROM /* hot */ users",
+                    "SELECT * FROM -- hot\n users",
+                    "/* a\nb */ SELECT * FROM users WHERE name = '--x'"):
+            with self.subTest(sql=sql):
+                self.assertEqual(tables_read(sql), {'users'})
+
+    def test_non_string_query(self) -> None:
+        """A non-SQL first argument is tagged as reading every table."""
+        for query in (None, 42):
+            with self.subTest(query=query):
+                self.assertEqual(read_tags('db', query),
+                                 {('db', UNKNOWN_TABLES), ('db', ANY_TABLE)})
+
+    def test_no_table(self) -> None:
+        """A SELECT without tables is unknown, so it depends on all."""
+        self.assertIsNone(tables_read("SELECT 1"))
+        self.assertIn(('db', '?'), read_tags('db', "SELECT 1"))
+        self.assertIn(('db', ANY_TABLE), read_tags('db', "SELECT 1"))
+
+
+class TestTablesWritten(unittest.TestCase):
+    """Tests `tables_written`."""
+
+    def test_writes(self) -> None:
+        """Each write statement form yields its target table."""
+        cases = {
+            "UPDATE users SET email = ? WHERE id = ?": {'users'},
+            "UPDATE OR IGNORE main.Users SET a = 1": {'users'},
+            "INSERT INTO users (name) VALUES ('x')": {'users'},
+            "INSERT OR REPLACE INTO users (a) VALUES (1)": {'users'},
+            "REPLACE INTO t VALUES (1)": {'t'},
+            "DELETE FROM `users` WHERE 1": {'users'},
+            "CREATE TABLE IF NOT EXISTS logs (id INT)": {'logs'},
+            "DROP TABLE IF EXISTS main.logs": {'logs'},
+            "CREATE INDEX idx ON users (email)": set(),
+            "WITH c AS (SELECT 1) INSERT INTO logs SELECT * FROM c":
+                {'logs'},
+        }
+        for sql, expected in cases.items():
+            with self.subTest(sql=sql):
+                self.assertEqual(tables_written(sql), expected)
+
+    def test_non_writes(self) -> None:
+        """Reads and transaction control write nothing."""
+        for sql in ("SELECT * FROM users", "BEGIN", "COMMIT", "",
+                    "/* only a comment */"):
+            with self.subTest(sql=sql):
+                self.assertEqual(tables_written(sql), set())
+
+    def test_comments(self) -> None:
+        """Leading and inline comments don't hide the written table."""
+        cases = {
+            "/* c */ UPDATE users SET a = 1": {'users'},
+            "-- c\nDELETE FROM /* t */ users": {'users'},
+            "INSERT INTO -- t\n users VALUES (1)": {'users'},
+        }
+        for sql, expected in cases.items():
+            with self.subTest(sql=sql):
+                self.assertEqual(tables_written(sql), expected)
+
+    def test_unrecognised_is_unknown(self) -> None:
+        """A statement the parser can't classify counts as an unknown write."""
+        for sql in ("MERGE INTO users USING t ON 1", "UPSERT users"):
+            with self.subTest(sql=sql):
+                self.assertIsNone(tables_written(sql))
+
+    def test_trigger_trace(self) -> None:
+        """Trigger-body traces ('--' lines) are unidentified writes."""
+        self.assertIsNone(tables_written("-- TRIGGER audit_users"))
+
+    def test_tracker(self) -> None:
+        """WriteTracker collects tables until an unknown write is seen."""
+        tracker = WriteTracker()
+        for sql in ("BEGIN", "UPDATE users SET a = 1",
+                    "INSERT INTO orders VALUES (1)", "COMMIT"):
+            tracker(sql)
+        self.assertEqual(tracker.tables, {'users', 'orders'})
+        tracker("-- TRIGGER t")
+        tracker("DELETE FROM items")
+        self.assertIsNone(tracker.tables)
+
+
+class TestDatabasePath(unittest.TestCase):
+    """Tests `database_path`."""
+
+    def test_resolved_once_per_connection(self) -> None:
+        """PRAGMA database_list runs on the first call only."""
+        conn = sqlite3.connect(':memory:', factory=TrackingConnection)
+        traced = []
+        conn.set_trace_callback(traced.append)
+        for _ in range(3):
+            self.assertEqual(database_path(conn), '')
+        self.assertEqual(traced, ["PRAGMA database_list"])
+        conn.close()
+
+    def test_plain_connection(self) -> None:
+        """A plain sqlite3 connection still resolves its path."""
+        conn = sqlite3.connect(':memory:')
+        self.assertEqual(database_path(conn), '')
+        conn.close()
+
+
+class TestQueryCache(unittest.TestCase):
+    """Tests `QueryCache.get`/`set`: LRU bounds, TTL and counters."""
+
+    def test_hit_and_miss(self) -> None:
+        """get returns the stored value, or MISSING, and counts both."""
+        cache = QueryCache()
+        self.assertIs(cache.get('k'), MISSING)
+        cache.set('k', [(1,)])
+        self.assertEqual(cache.get('k'), [(1,)])
+        stats = cache.stats()
+        self.assertEqual((stats['hits'], stats['misses']), (1, 1))
+
+    def test_max_entries_evicts_least_recently_used(self) -> None:
+        """Past max_entries the least recently read entry goes first."""
+        cache = QueryCache(max_entries=2)
+        cache.set('a', [1])
+        cache.set('b', [2])
+        cache.get('a')
+        cache.set('c', [3])
+        self.assertIs(cache.get('b'), MISSING)
+        self.assertEqual(cache.get('a'), [1])
+        self.assertEqual(cache.get('c'), [3])
+        self.assertEqual(cache.stats()['evictions'], 1)
+        self.assertEqual(len(cache), 2)
+
+    def test_max_bytes_eviction(self) -> None:
+        """Entries are evicted oldest first until the bytes fit."""
+        row = [('x' * 100,)]
+        size = estimate_size(row)
+        cache = QueryCache(max_bytes=2 * size)
+        for key in ('a', 'b', 'c'):
+            cache.set(key, row)
+        self.assertEqual(len(cache), 2)
+        self.assertIs(cache.get('a'), MISSING)
+        self.assertEqual(cache.stats()['bytes'], 2 * size)
+        self.assertEqual(cache.stats()['evictions'], 1)
+
+    def test_oversized_value_not_stored(self) -> None:
+        """A result larger than max_bytes is never cached."""
+        cache = QueryCache(max_bytes=10)
+        cache.set('k', [(1, 2, 3)])
+        self.assertEqual(len(cache), 0)
+        self.assertEqual(cache.stats()['evictions'], 0)
+
+    def test_replacing_a_key_keeps_bytes_in_step(self) -> None:
+        """Setting an existing key replaces its size, not adds to it."""
+        cache = QueryCache()
+        cache.set('k', [(1,)])
+        cache.set('k', [(2,)])
+        self.assertEqual(cache.stats()['bytes'], estimate_size([(2,)]))
+        self.assertEqual(len(cache), 1)
+
+    @patch('query_cache.time.monotonic')
+    def test_ttl_expiry(self, monotonic) -> None:
+        """Entries expire after their ttl; ttl=None never expires."""
+        monotonic.return_value = 1000.0
+        cache = QueryCache(ttl=10)
+        cache.set('default', [1])
+        cache.set('short', [2], ttl=1)
+        cache.set('forever', [3], ttl=None)
+        monotonic.return_value = 1005.0
+        self.assertIs(cache.get('short'), MISSING)
+        self.assertEqual(cache.get('default'), [1])
+        monotonic.return_value = 1010.0
+        self.assertIs(cache.get('default'), MISSING)
+        monotonic.return_value = 10 ** 9
+        self.assertEqual(cache.get('forever'), [3])
+        stats = cache.stats()
+        self.assertEqual(stats['expirations'], 2)
+        self.assertEqual((stats['hits'], stats['misses']), (2, 2))
+        self.assertEqual(stats['entries'], 1)
+
+
+def wait_until(condition, timeout=5.0):
+    """Poll until condition() holds; fail the test on timeout"""
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            raise AssertionError("condition not reached")
+        time.sleep(0.001)
+
+
+class TestGetOrCompute(unittest.TestCase):
+    """Tests single-flight and stale serving in `get_or_compute`."""
+
+    def setUp(self) -> None:
+        self.cache = QueryCache(ttl=60)
+        self.release = threading.Event()
+        self.calls = 0
+
+    def blocking(self, value):
+        """compute() that waits for self.release"""
+        def compute():
+            self.calls += 1
+            self.release.wait(5)
+            if isinstance(value, Exception):
+                raise value
+            return value
+        return compute
+
+    def run_threads(self, count, target):
+        threads = [threading.Thread(target=target) for _ in range(count)]
+        for thread in threads:
+            thread.start()
+        return threads
+
+    def test_concurrent_misses_compute_once(self) -> None:
+        """N concurrent misses run compute once and share its result."""
+        results = []
+        compute = self.blocking(['rows'])
+        threads = self.run_threads(8, lambda: results.append(
+            self.cache.get_or_compute('k', compute)))
+        wait_until(lambda: self.cache.coalesced == 7)
+        self.release.set()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(self.calls, 1)
+        self.assertEqual([value for value, _ in results], [['rows']] * 8)
+        self.assertEqual(sorted(status for _, status in results),
+                         ['miss'] + ['shared'] * 7)
+        self.assertEqual(self.cache.get_or_compute('k', compute),
+                         (['rows'], 'hit'))
+
+    def test_waiters_get_leader_exception(self) -> None:
+        """When the leader's compute fails every waiter sees its error."""
+        error = ValueError("query failed")
+        errors = []
+
+        def call():
+            try:
+                self.cache.get_or_compute('k', self.blocking(error))
+            except ValueError as err:
+                errors.append(err)
+
+        threads = self.run_threads(5, call)
+        wait_until(lambda: self.cache.coalesced == 4)
+        self.release.set()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(self.calls, 1)
+        self.assertEqual(len(errors), 5)
+        self.assertTrue(all(err is error for err in errors))
+        self.assertEqual(len(self.cache), 0)
+
+    def test_stale_served_only_during_refresh(self) -> None:
+        """An expired entry is served while, and only while, it refreshes."""
+        self.cache.set('k', ['old'], ttl=0)
+        refreshed = []
+        refresher = self.run_threads(1, lambda: refreshed.append(
+            self.cache.get_or_compute('k', self.blocking(['new']),
+                                      stale=60)))[0]
+        wait_until(lambda: self.calls == 1)
+        self.assertEqual(
+            self.cache.get_or_compute('k', self.blocking(['other']),
+                                      stale=60),
+            (['old'], 'stale'))
+        self.release.set()
+        refresher.join()
+        self.assertEqual(refreshed, [(['new'], 'miss')])
+        self.assertEqual(self.cache.get_or_compute('k', list, stale=60),
+                         (['new'], 'hit'))
+        self.assertEqual(self.calls, 1)
+
+    def test_expired_without_refresh_is_a_miss(self) -> None:
+        """With no refresh in flight the first caller recomputes."""
+        self.cache.set('k', ['old'], ttl=0)
+        self.assertEqual(
+            self.cache.get_or_compute('k', lambda: ['new'], stale=60),
+            (['new'], 'miss'))
+        self.cache.set('j', ['old'], ttl=0)
+        self.assertEqual(self.cache.get_or_compute('j', lambda: ['new']),
+                         (['new'], 'miss'))
+
+    def test_invalidation_during_compute_is_not_stored(self) -> None:
+        """invalidate_tags mid-compute keeps the result out of the cache."""
+        tags = {('db', 'users')}
+        results = []
+        leader = self.run_threads(1, lambda: results.append(
+            self.cache.get_or_compute('k', self.blocking(['old']),
+                                      tags=tags)))[0]
+        wait_until(lambda: self.calls == 1)
+        self.cache.invalidate_tags(tags)
+        # A caller arriving after the invalidation starts its own compute
+        self.assertEqual(
+            self.cache.get_or_compute('k', lambda: ['new'], tags=tags),
+            (['new'], 'miss'))
+        self.release.set()
+        leader.join()
+        self.assertEqual(results, [(['old'], 'miss')])
+        self.assertEqual(self.cache.get_or_compute('k', list, tags=tags),
+                         (['new'], 'hit'))
+
+
+class TestTransactionalInvalidation(unittest.TestCase):
+    """A @transactional commit drops only the dependent cache entries."""
+
+    @classmethod
+    def setUpClass(cls) -> None:
+        """Build users.db in a scratch directory, then load the modules.
+
+        The numbered files run their demo on import against ./users.db.
+        """
+        cls.cwd = os.getcwd()
+        cls.tmp = tempfile.TemporaryDirectory()
+        os.chdir(cls.tmp.name)
+        conn = sqlite3.connect('users.db')
+        conn.execute("CREATE TABLE users "
+                     "(id INTEGER PRIMARY KEY, name TEXT, email TEXT)")
+        conn.execute("CREATE TABLE orders "
+                     "(id INTEGER PRIMARY KEY, user_id INT)")
+        conn.execute("INSERT INTO users VALUES (1, 'a', 'a@x')")
+        conn.commit()
+        conn.close()
+        cls.transactional = importlib.import_module('2-transactional')
+        cls.cached = importlib.import_module('4-cache_query')
+
+    @classmethod
+    def tearDownClass(cls) -> None:
+        os.chdir(cls.cwd)
+        cls.tmp.cleanup()
+
+    def setUp(self) -> None:
+        shared_cache.clear()
+
+        @self.cached.with_db_connection
+        @self.cached.cache_query
+        def fetch(conn, query, params=()):
+            return conn.execute(query, params).fetchall()
+        self.fetch = fetch
+
+    def test_round_trip(self) -> None:
+        """Updating users drops the users entry but keeps orders."""
+        email = "SELECT email FROM users WHERE id = ?"
+        orders = "SELECT * FROM orders"
+        self.fetch(query=email, params=(1,))
+        self.fetch(query=orders)
+        self.assertEqual(len(shared_cache), 2)
+        invalidations = shared_cache.stats()['invalidations']
+
+        self.transactional.update_user_email(user_id=1,
+                                             new_email='b@x')
+
+        self.assertEqual(len(shared_cache), 1)
+        self.assertEqual(self.fetch(query=email, params=(1,)), [('b@x',)])
+        self.assertEqual(shared_cache.stats()['invalidations'],
+                         invalidations + 1)
+
+    def test_non_string_arguments(self) -> None:
+        """Functions taking an id, or nothing, are cached and invalidated."""
+        @self.cached.with_db_connection
+        @self.cached.cache_query
+        def get_user_by_id(conn, user_id):
+            return conn.execute("SELECT email FROM users WHERE id = ?",
+                                (user_id,)).fetchall()
+
+        @self.cached.with_db_connection
+        @self.cached.cache_query
+        def count_users(conn):
+            return conn.execute("SELECT COUNT(*) FROM users").fetchall()
+
+        self.assertEqual(count_users(), [(1,)])
+        email = get_user_by_id(1)
+        hits = shared_cache.stats()['hits']
+        self.assertEqual(get_user_by_id(1), email)
+        self.assertEqual(len(shared_cache), 2)
+        self.assertEqual(shared_cache.stats()['hits'], hits + 1)
+
+        self.transactional.update_user_email(user_id=1,
+                                             new_email='c@x')
+
+        self.assertEqual(len(shared_cache), 0)
+        self.assertEqual(get_user_by_id(1), [('c@x',)])
+
+    def test_rollback_keeps_entries(self) -> None:
+        """A failed transaction invalidates nothing."""
+        self.fetch(query="SELECT * FROM users")
+
+        @self.transactional.with_db_connection
+        @self.transactional.transactional
+        def failing(conn):
+            conn.execute("DELETE FROM users")
+            raise RuntimeError("boom")
+
+        with self.assertRaises(RuntimeError):
+            failing()
+        self.assertEqual(len(shared_cache), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -14,10 +14,14 @@ if connection:
         seed.create_table(connection)
         seed.insert_data(connection, 'user_data.csv')
         cursor = connection.cursor()
-        cursor.execute(f"SELECT SCHEMA_NAME FROM INFORMATION_SCHEMA.SCHEMATA WHERE SCHEMA_NAME = 'ALX_prodev';")
-        result = cursor.fetchone()
-        if result:
-            print(f"Database ALX_prodev is present ")
+        # SQLite has no INFORMATION_SCHEMA; the database is the file itself
+        if seed.backend_name() == 'sqlite':
+            print(f"Database {seed.database_name()} is present ")
+        else:
+            cursor.execute(f"SELECT SCHEMA_NAME FROM INFORMATION_SCHEMA.SCHEMATA WHERE SCHEMA_NAME = 'ALX_prodev';")
+            result = cursor.fetchone()
+            if result:
+                print(f"Database ALX_prodev is present ")
         cursor.execute(f"SELECT * FROM user_data LIMIT 5;")
         rows = cursor.fetchall()
         print(rows)
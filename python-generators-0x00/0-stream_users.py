@@ -1,12 +1,32 @@
 # File: 0-stream_users.py
 # ===============================
-from seed import connect_to_prodev
+from instrumentation import traced
+from pool import pooled_connection
+from rows import make_row_factory
 
-def stream_users():
-    connection = connect_to_prodev()
-    cursor = connection.cursor(dictionary=True)
-    cursor.execute("SELECT * FROM user_data")
-    for row in cursor:
-        yield row
-    cursor.close()
-    connection.close()
+def stream_users(prefetch=None, row_factory=None):
+    """Yield user_data rows one by one from an unbuffered cursor.
+
+    Rows stay on the server until asked for; with prefetch set they are
+    pulled prefetch at a time with fetchmany, so client memory is bounded
+    by prefetch rather than the table size. The connection comes from the
+    shared pool and is dropped, not returned, if the caller stops early
+    (e.g. islice in 1-main.py) and leaves rows unread.
+
+    row_factory picks the row type: dicts by default, or 'tuple',
+    'record', 'plain' or a callable (see rows.make_row_factory).
+    """
+    build = make_row_factory(row_factory)
+    with pooled_connection() as connection:
+        cursor = connection.cursor(dictionary=build is None, buffered=False)
+        with traced(cursor, 'stream_users') as cursor:
+            cursor.execute("SELECT user_id, name, email, age FROM user_data")
+            if prefetch:
+                rows = cursor.fetchmany(prefetch)
+                while rows:
+                    yield from (rows if build is None else map(build, rows))
+                    rows = cursor.fetchmany(prefetch)
+            else:
+                for row in cursor:
+                    yield row if build is None else build(row)
+            cursor.close()
@@ -1,29 +1,67 @@
 # File: 1-batch_processing.py
 # ===============================
-from seed import connect_to_prodev
+from array import array
+from instrumentation import traced
+from pool import pooled_connection
+from rows import make_row_factory
+from seed import USER_COLUMNS
 
-def stream_users_in_batches(batch_size):
-    connection = connect_to_prodev()
-    cursor = connection.cursor(dictionary=True)
-    cursor.execute("SELECT * FROM user_data")
+def _select_users(columns, older_than):
+    """Build the projected, filtered user_data query and its parameters"""
+    unknown = set(columns) - set(USER_COLUMNS)
+    if unknown:
+        raise ValueError(f"Unknown user_data columns: {sorted(unknown)}")
+    query = f"SELECT {', '.join(columns)} FROM user_data"
+    if older_than is None:
+        return query, ()
+    return query + " WHERE age > %s", (older_than,)
 
-    batch = []
-    for row in cursor:
-        batch.append(row)
-        if len(batch) == batch_size:
-            yield batch
-            batch = []
-    if batch:
-        yield batch
+def _fetch_batches(batch_size, columns, older_than, dictionary):
+    query, params = _select_users(columns, older_than)
+    with pooled_connection() as connection:
+        cursor = connection.cursor(dictionary=dictionary, buffered=False)
+        with traced(cursor, 'stream_users_in_batches') as cursor:
+            cursor.execute(query, params)
+            batch = cursor.fetchmany(batch_size)
+            while batch:
+                yield batch
+                batch = cursor.fetchmany(batch_size)
+            cursor.close()
+
+def stream_users_in_batches(batch_size, columns=USER_COLUMNS, older_than=None,
+                            row_factory=None):
+    """Yield lists of users, filtered and projected by the database.
+
+    older_than=N keeps only users whose age is strictly greater than N.
+    Rows are dicts unless row_factory asks for 'tuple', 'record' or
+    'plain' rows (see rows.make_row_factory).
+    """
+    build = make_row_factory(row_factory, columns)
+    batches = _fetch_batches(batch_size, columns, older_than,
+                             dictionary=build is None)
+    if build is None:
+        return batches
+    return ([build(row) for row in batch] for batch in batches)
 
-    cursor.close()
-    connection.close()
+def stream_user_columns(batch_size, columns=USER_COLUMNS, older_than=None):
+    """Yield batches as {column: values} instead of lists of row dicts.
+
+    Rows come off a tuple cursor and are transposed once per batch; age is
+    packed into an array('q'), text columns stay lists. older_than=N
+    keeps only ages strictly greater than N.
+    """
+    for rows in _fetch_batches(batch_size, columns, older_than,
+                               dictionary=False):
+        batch = dict(zip(columns, zip(*rows)))
+        if 'age' in batch:
+            batch['age'] = array('q', batch['age'])
+        yield batch
 
 def batch_processing(batch_size):
-    processed_users = []
-    for batch in stream_users_in_batches(batch_size):
+    """Print users over 25, filtered in SQL; returns how many were printed"""
+    processed = 0
+    for batch in stream_users_in_batches(batch_size, older_than=25):
         for user in batch:
-            if user['age'] > 25:
-                print(user)
-                processed_users.append(user)
-    return processed_users
\ No newline at end of file
+            print(user)
+        processed += len(batch)
+    return processed
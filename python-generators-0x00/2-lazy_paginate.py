@@ -1,20 +1,127 @@
 # File: 2-lazy_paginate.py
 # ===============================
-from seed import connect_to_prodev
+import base64
+import json
+import queue
+import threading
+from instrumentation import traced
+from pool import pooled_connection
+from seed import USER_COLUMNS
+
+_DONE = object()
+# Named columns, so enabling change tracking (updated_at) leaves the row
+# shape alone
+SELECT_USERS = f"SELECT {', '.join(USER_COLUMNS)} FROM user_data"
 
 def paginate_users(page_size, offset):
-    connection = connect_to_prodev()
-    cursor = connection.cursor(dictionary=True)
-    cursor.execute(f"SELECT * FROM user_data LIMIT {page_size} OFFSET {offset}")
-    rows = cursor.fetchall()
-    connection.close()
+    with pooled_connection() as connection:
+        cursor = connection.cursor(dictionary=True)
+        with traced(cursor, 'paginate_users') as cursor:
+            cursor.execute(SELECT_USERS + " LIMIT %s OFFSET %s",
+                           (page_size, offset))
+            rows = cursor.fetchall()
+            cursor.close()
     return rows
 
-def lazy_pagination(page_size):
-    offset = 0
-    while True:
-        rows = paginate_users(page_size, offset)
-        if not rows:
-            break
-        yield rows
-        offset += page_size
\ No newline at end of file
+def encode_page_token(user_id):
+    """Opaque resume token for the page that ends at user_id"""
+    payload = json.dumps({'after': user_id}).encode('utf-8')
+    return base64.urlsafe_b64encode(payload).decode('ascii')
+
+def decode_page_token(token):
+    """Return the user_id a resume token points after, or None"""
+    if not token:
+        return None
+    return json.loads(base64.urlsafe_b64decode(token.encode('ascii')))['after']
+
+def next_page_token(page):
+    """Token to pass as resume_token to continue after this page"""
+    return encode_page_token(page[-1]['user_id'])
+
+def seek_users(cursor, page_size, after=None):
+    """Fetch the page of users whose user_id sorts after `after`.
+
+    Seeks on the primary key index, so every page costs the same no matter
+    how deep into the table it is.
+    """
+    if after is None:
+        cursor.execute(
+            SELECT_USERS + " ORDER BY user_id LIMIT %s",
+            (page_size,))
+    else:
+        cursor.execute(
+            SELECT_USERS + " WHERE user_id > %s ORDER BY user_id LIMIT %s",
+            (after, page_size))
+    return cursor.fetchall()
+
+def _keyset_pages(page_size, after):
+    with pooled_connection() as connection:
+        cursor = connection.cursor(dictionary=True)
+        with traced(cursor, 'lazy_pagination') as cursor:
+            while True:
+                rows = seek_users(cursor, page_size, after)
+                if not rows:
+                    break
+                yield rows
+                after = rows[-1]['user_id']
+            cursor.close()
+
+def _reserve(slots, stop):
+    """Block until a prefetch slot frees up or the consumer has gone away"""
+    while not stop.is_set():
+        if slots.acquire(timeout=0.1):
+            return True
+    return False
+
+def _prefetched_pages(page_size, after, depth):
+    """Fetch up to `depth` pages ahead on a background thread.
+
+    The fetcher takes a slot before reading each page and the consumer
+    gives it back as it takes the page, so at most `depth` fetched pages
+    wait ahead of the one being processed (a queue bound alone would let
+    the fetcher hold one more while blocked on put).
+    """
+    pages = queue.Queue()
+    slots = threading.Semaphore(depth)
+    stop = threading.Event()
+
+    def fetch():
+        source = _keyset_pages(page_size, after)
+        try:
+            while _reserve(slots, stop):
+                rows = next(source, _DONE)
+                pages.put(rows)
+                if rows is _DONE:
+                    return
+        except Exception as err:
+            pages.put(err)
+        finally:
+            source.close()
+
+    fetcher = threading.Thread(target=fetch, daemon=True)
+    fetcher.start()
+    try:
+        while True:
+            item = pages.get()
+            slots.release()
+            if item is _DONE:
+                return
+            if isinstance(item, Exception):
+                raise item
+            yield item
+    finally:
+        stop.set()
+        fetcher.join()
+
+def lazy_pagination(page_size, resume_token=None, prefetch=0):
+    """Yield pages of users in user_id order over a single connection.
+
+    Save next_page_token(page) once a page is processed; passing it back as
+    resume_token continues right after that page. With prefetch=k the next
+    k pages (never more) are fetched in the background while the current
+    one is used.
+    """
+    after = decode_page_token(resume_token)
+    if prefetch:
+        return _prefetched_pages(page_size, after, prefetch)
+    return _keyset_pages(page_size, after)
@@ -1,26 +1,216 @@
 # File: 4-stream_ages.py
 # ===============================
-from seed import connect_to_prodev
+import math
+import sys
+import time
+from array import array
+from collections import Counter
+from age_stats_store import age_totals, cached_histogram
+from instrumentation import traced
+from pool import pooled_connection
 
 def stream_user_ages():
-    connection = connect_to_prodev()
-    cursor = connection.cursor()
-    cursor.execute("SELECT age FROM user_data")
-    for (age,) in cursor:
-        yield float(age)
-    cursor.close()
-    connection.close()
-
-def average_age():
-    total = 0
-    count = 0
-    for age in stream_user_ages():
+    with pooled_connection() as connection:
+        cursor = connection.cursor()
+        with traced(cursor, 'stream_user_ages') as cursor:
+            cursor.execute("SELECT age FROM user_data")
+            for (age,) in cursor:
+                yield float(age)
+            cursor.close()
+
+def stream_age_chunks(chunk_size=10000):
+    """Yield ages as array('d') chunks fetched with fetchmany"""
+    with pooled_connection() as connection:
+        cursor = connection.cursor(buffered=False)
+        with traced(cursor, 'stream_age_chunks') as cursor:
+            cursor.execute("SELECT age FROM user_data")
+            rows = cursor.fetchmany(chunk_size)
+            while rows:
+                yield array('d', (age for (age,) in rows))
+                rows = cursor.fetchmany(chunk_size)
+            cursor.close()
+
+class RunningStats:
+    """Streaming count/sum/mean/variance/min/max plus an exact histogram.
+
+    Each chunk is first counted into a {value: frequency} table (a C loop
+    in Counter), then reduced over its distinct values with math.fsum, and
+    merged with Chan's parallel form of Welford's update. Ages have few
+    distinct values, so per-chunk Python work is tiny and the mean and
+    variance stay accurate over millions of values.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+        self.histogram = Counter()
+
+    def update(self, chunk):
+        n = len(chunk)
+        if not n:
+            return
+        counts = Counter(chunk)
+        chunk_total = math.fsum(value * freq for value, freq in counts.items())
+        chunk_mean = chunk_total / n
+        chunk_m2 = math.fsum(freq * (value - chunk_mean) ** 2
+                             for value, freq in counts.items())
+        count = self.count + n
+        delta = chunk_mean - self.mean
+        self.mean += delta * n / count
+        self.m2 += chunk_m2 + delta * delta * self.count * n / count
+        self.count = count
+        self.total = math.fsum((self.total, chunk_total))
+        self.min = min(self.min, min(counts))
+        self.max = max(self.max, max(counts))
+        self.histogram.update(counts)
+
+    def summary(self, percentiles=(50, 90, 99)):
+        return _summary(self.count, self.total, self.m2, self.min, self.max,
+                        self.histogram, percentiles)
+
+def _percentiles(histogram, count, percentiles):
+    """Nearest-rank percentiles from a {value: frequency} histogram"""
+    result = {}
+    if not count:
+        return result
+    values = sorted(histogram.items())
+    for p in percentiles:
+        rank = max(1, math.ceil(p / 100 * count))
+        seen = 0
+        for value, freq in values:
+            seen += freq
+            if seen >= rank:
+                result[p] = value
+                break
+    return result
+
+def _summary(count, total, m2, low, high, histogram, percentiles):
+    return {
+        'count': count,
+        'sum': total,
+        'mean': total / count if count else 0.0,
+        'stddev': math.sqrt(m2 / count) if count else 0.0,
+        'min': low if count else None,
+        'max': high if count else None,
+        'percentiles': _percentiles(histogram, count, percentiles),
+    }
+
+def age_stats_sql(percentiles=(50, 90, 99)):
+    """Aggregate ages in the database.
+
+    Moments come from one aggregate query; percentiles from a GROUP BY age
+    histogram, which is a few hundred rows at most since ages are integers.
+    """
+    with pooled_connection() as connection:
+        cursor = connection.cursor()
+        with traced(cursor, 'age_stats_sql') as cursor:
+            cursor.execute(
+                "SELECT COUNT(age), SUM(age), MIN(age), MAX(age), "
+                "VAR_POP(age) FROM user_data")
+            count, total, low, high, variance = cursor.fetchone()
+            histogram = {}
+            if percentiles and count:
+                cursor.execute(
+                    "SELECT age, COUNT(*) FROM user_data GROUP BY age")
+                histogram = {float(age): n for age, n in cursor.fetchall()}
+            cursor.close()
+    m2 = float(variance or 0) * count
+    return _summary(count, float(total or 0), m2,
+                    float(low) if count else None,
+                    float(high) if count else None,
+                    histogram, percentiles)
+
+def age_stats_cached(percentiles=(50, 90, 99), max_age=None):
+    """Aggregate from the trigger-maintained store (age_stats_store).
+
+    Reads one small histogram instead of scanning user_data, and reuses it
+    in-process for max_age seconds (AGE_STATS_TTL by default).
+    """
+    histogram = cached_histogram(max_age)
+    count, total, squares = age_totals(histogram)
+    m2 = (count * squares - total * total) / count if count else 0.0
+    return _summary(count, float(total), m2,
+                    float(min(histogram)) if count else None,
+                    float(max(histogram)) if count else None,
+                    {float(age): n for age, n in histogram.items()},
+                    percentiles)
+
+def age_stats_stream(percentiles=(50, 90, 99), chunk_size=10000):
+    """Aggregate ages client-side over fetched chunks"""
+    stats = RunningStats()
+    for chunk in stream_age_chunks(chunk_size):
+        stats.update(chunk)
+    return stats.summary(percentiles)
+
+def age_stats(method='sql', percentiles=(50, 90, 99), chunk_size=10000):
+    """count/sum/mean/stddev/min/max/percentiles of user ages.
+
+    method='sql' pushes the work to the database; method='stream' reads
+    the ages in chunks when the aggregation has to happen client-side;
+    method='cache' answers from the age_stats_store histogram.
+    """
+    if method == 'sql':
+        return age_stats_sql(percentiles)
+    if method == 'cache':
+        return age_stats_cached(percentiles)
+    if method == 'stream':
+        return age_stats_stream(percentiles, chunk_size)
+    raise ValueError(f"Unknown aggregation method: {method}")
+
+def average_age(method='stream'):
+    if method != 'stream':
+        mean = age_stats(method, percentiles=())['mean']
+        print(f"Average age of users: {mean:.2f}")
+        return
+    stats = RunningStats()
+    for chunk in stream_age_chunks():
+        stats.update(chunk)
+    print(f"Average age of users: {stats.mean:.2f}")
+
+def benchmark_ages(rows=10_000_000, chunk_size=10000):
+    """Compare the row loop, chunked reduction and SQL pushdown.
+
+    The two client-side reducers run on synthetic ages so they can be
+    compared without a database; the database approaches run only if
+    ALX_prodev is reachable and measure whatever user_data holds.
+    """
+    ages = array('d', (float(18 + i * 7919 % 83) for i in range(rows)))
+
+    start = time.perf_counter()
+    total = count = 0
+    for age in ages:
         total += age
         count += 1
-    avg = total / count if count else 0
-    print(f"Average age of users: {avg:.2f}")
+    print(f"loop (mean)  {rows} rows: {time.perf_counter() - start:.2f}s")
+
+    start = time.perf_counter()
+    stats = RunningStats()
+    for i in range(0, rows, chunk_size):
+        stats.update(ages[i:i + chunk_size])
+    print(f"chunked      {rows} rows: {time.perf_counter() - start:.2f}s")
+
+    for method in ('stream', 'sql', 'cache'):
+        start = time.perf_counter()
+        try:
+            result = age_stats(method, chunk_size=chunk_size)
+        except Exception as err:
+            print(f"{method:<12} skipped: {err}")
+            continue
+        print(f"{method:<12} {result['count']} rows: "
+              f"{time.perf_counter() - start:.2f}s")
 
 if __name__ == "__main__":
-    average_age()
+    if len(sys.argv) > 1 and sys.argv[1] == '--benchmark':
+        benchmark_ages(int(sys.argv[2]) if len(sys.argv) > 2 else 10_000_000)
+    elif len(sys.argv) > 1 and sys.argv[1] == '--cached':
+        average_age('cache')
+    else:
+        average_age()
 # This script calculates the average age of users from a database.
-# It connects to the database, retrieves ages, and computes the average.
\ No newline at end of file
+# It connects to the database, retrieves ages, and computes the average.
+# Run with --benchmark [rows] to compare the aggregation strategies, or
+# --cached to read the age_stats_store histogram instead of scanning.
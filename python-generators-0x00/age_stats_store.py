@@ -0,0 +1,204 @@
+# File: age_stats_store.py
+# ===============================
+import os
+import sys
+import threading
+import time
+from backends import backend_name
+from instrumentation import traced
+from pool import pooled_connection
+from seed import DB_ERRORS, connect_to_prodev
+
+CACHE_TTL = float(os.getenv('AGE_STATS_TTL', '5'))
+SLOTS = 16
+
+_TRIGGERS = ('user_age_stats_ai', 'user_age_stats_ad', 'user_age_stats_au')
+
+# Each MySQL connection bumps its own slot row, so concurrent writers
+# (e.g. insert_data_parallel shards) don't queue on one row per age.
+_MYSQL_TRIGGERS = (
+    f"""
+    CREATE TRIGGER user_age_stats_ai AFTER INSERT ON user_data FOR EACH ROW
+    INSERT INTO user_age_stats (age, slot, users)
+    VALUES (NEW.age, CONNECTION_ID() % {SLOTS}, 1)
+    ON DUPLICATE KEY UPDATE users = users + 1
+    """,
+    f"""
+    CREATE TRIGGER user_age_stats_ad AFTER DELETE ON user_data FOR EACH ROW
+    INSERT INTO user_age_stats (age, slot, users)
+    VALUES (OLD.age, CONNECTION_ID() % {SLOTS}, -1)
+    ON DUPLICATE KEY UPDATE users = users - 1
+    """,
+    f"""
+    CREATE TRIGGER user_age_stats_au AFTER UPDATE ON user_data FOR EACH ROW
+    BEGIN
+        IF OLD.age <> NEW.age THEN
+            INSERT INTO user_age_stats (age, slot, users)
+            VALUES (OLD.age, CONNECTION_ID() % {SLOTS}, -1)
+            ON DUPLICATE KEY UPDATE users = users - 1;
+            INSERT INTO user_age_stats (age, slot, users)
+            VALUES (NEW.age, CONNECTION_ID() % {SLOTS}, 1)
+            ON DUPLICATE KEY UPDATE users = users + 1;
+        END IF;
+    END
+    """,
+)
+
+# SQLite has a single writer, so everything goes to slot 0.
+_SQLITE_TRIGGERS = (
+    """
+    CREATE TRIGGER user_age_stats_ai AFTER INSERT ON user_data BEGIN
+        INSERT INTO user_age_stats (age, slot, users) VALUES (NEW.age, 0, 1)
+        ON CONFLICT (age, slot) DO UPDATE SET users = users + 1;
+    END
+    """,
+    """
+    CREATE TRIGGER user_age_stats_ad AFTER DELETE ON user_data BEGIN
+        INSERT INTO user_age_stats (age, slot, users) VALUES (OLD.age, 0, -1)
+        ON CONFLICT (age, slot) DO UPDATE SET users = users - 1;
+    END
+    """,
+    """
+    CREATE TRIGGER user_age_stats_au AFTER UPDATE OF age ON user_data
+    WHEN OLD.age <> NEW.age BEGIN
+        INSERT INTO user_age_stats (age, slot, users) VALUES (OLD.age, 0, -1)
+        ON CONFLICT (age, slot) DO UPDATE SET users = users - 1;
+        INSERT INTO user_age_stats (age, slot, users) VALUES (NEW.age, 0, 1)
+        ON CONFLICT (age, slot) DO UPDATE SET users = users + 1;
+    END
+    """,
+)
+
+_cache = {'histogram': None, 'expires': 0.0}
+_cache_lock = threading.Lock()
+
+
+def install_age_stats(connection):
+    """Create user_age_stats, its user_data triggers, and backfill it.
+
+    From then on every INSERT, UPDATE or DELETE on user_data - insert_data,
+    the bulk and parallel loaders, reseed_data or anything else - keeps the
+    per-age counts current inside the writing transaction. TRUNCATE fires
+    no triggers, so run rebuild_age_stats after one. Safe to run repeatedly.
+    """
+    try:
+        cursor = connection.cursor()
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS user_age_stats (
+                age INT NOT NULL,
+                slot INT NOT NULL,
+                users BIGINT NOT NULL,
+                PRIMARY KEY (age, slot)
+            )
+        """)
+        for name in _TRIGGERS:
+            cursor.execute(f"DROP TRIGGER IF EXISTS {name}")
+        triggers = (_SQLITE_TRIGGERS if backend_name() == 'sqlite'
+                    else _MYSQL_TRIGGERS)
+        for trigger in triggers:
+            cursor.execute(trigger)
+        cursor.close()
+        rebuild_age_stats(connection)
+        print("Age statistics store installed")
+    except DB_ERRORS as err:
+        print(f"Error installing age statistics: {err}")
+
+
+def rebuild_age_stats(connection):
+    """Recount user_age_stats from a full scan of user_data"""
+    cursor = connection.cursor()
+    cursor.execute("DELETE FROM user_age_stats")
+    cursor.execute("""
+        INSERT INTO user_age_stats (age, slot, users)
+        SELECT age, 0, COUNT(*) FROM user_data GROUP BY age
+    """)
+    connection.commit()
+    cursor.close()
+    invalidate_age_stats()
+
+
+def read_histogram(connection):
+    """{age: users} from the store; reads at most SLOTS rows per age"""
+    cursor = connection.cursor()
+    with traced(cursor, 'age_stats_store') as cursor:
+        cursor.execute("""
+            SELECT age, SUM(users) FROM user_age_stats
+            GROUP BY age HAVING SUM(users) <> 0
+        """)
+        histogram = {int(age): int(users) for age, users in cursor.fetchall()}
+        cursor.close()
+    return histogram
+
+
+def cached_histogram(max_age=None):
+    """The store's histogram, reused for up to max_age seconds.
+
+    max_age defaults to AGE_STATS_TTL (5s); 0 always reads the store.
+    """
+    max_age = CACHE_TTL if max_age is None else max_age
+    with _cache_lock:
+        if _cache['histogram'] is not None and \
+                time.monotonic() < _cache['expires']:
+            return _cache['histogram']
+    with pooled_connection() as connection:
+        histogram = read_histogram(connection)
+    with _cache_lock:
+        _cache['histogram'] = histogram
+        _cache['expires'] = time.monotonic() + max_age
+    return histogram
+
+
+def invalidate_age_stats():
+    """Drop the in-process copy so the next read goes to the store"""
+    with _cache_lock:
+        _cache['histogram'] = None
+
+
+def age_totals(histogram):
+    """(count, sum, sum of squares) of the ages in a histogram, exactly"""
+    count = sum(histogram.values())
+    total = sum(age * users for age, users in histogram.items())
+    squares = sum(age * age * users for age, users in histogram.items())
+    return count, total, squares
+
+
+def verify_age_stats(connection, repair=False):
+    """Reconcile the store against a full GROUP BY scan of user_data.
+
+    Returns {'ok', 'rows', 'mismatches'} where mismatches maps each
+    disagreeing age to (stored, actual). repair=True rebuilds the store
+    when they differ.
+    """
+    cursor = connection.cursor()
+    cursor.execute("SELECT age, COUNT(*) FROM user_data GROUP BY age")
+    actual = {int(age): int(users) for age, users in cursor.fetchall()}
+    cursor.close()
+    stored = read_histogram(connection)
+    mismatches = {age: (stored.get(age, 0), actual.get(age, 0))
+                  for age in sorted(set(stored) | set(actual))
+                  if stored.get(age, 0) != actual.get(age, 0)}
+    if mismatches and repair:
+        rebuild_age_stats(connection)
+    return {'ok': not mismatches, 'rows': sum(actual.values()),
+            'mismatches': mismatches}
+
+
+if __name__ == "__main__":
+    command = sys.argv[1] if len(sys.argv) > 1 else 'verify'
+    connection = connect_to_prodev()
+    if connection is None:
+        sys.exit(1)
+    if command == 'install':
+        install_age_stats(connection)
+    elif command in ('verify', 'repair'):
+        result = verify_age_stats(connection, repair=command == 'repair')
+        for age, (stored, actual) in result['mismatches'].items():
+            print(f"age {age}: stored {stored}, actual {actual}")
+        state = 'in sync' if result['ok'] else (
+            'rebuilt' if command == 'repair' else 'OUT OF SYNC')
+        print(f"Age statistics {state} ({result['rows']} rows scanned)")
+        if not result['ok'] and command == 'verify':
+            sys.exit(1)
+    else:
+        print("Usage: age_stats_store.py [install|verify|repair]")
+    connection.close()
@@ -0,0 +1,73 @@
+# File: async_streams.py
+# ===============================
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+
+stream_users = __import__('0-stream_users').stream_users
+stream_users_in_batches = __import__('1-batch_processing').stream_users_in_batches
+lazy_pagination = __import__('2-lazy_paginate').lazy_pagination
+stream_user_ages = __import__('4-stream_ages').stream_user_ages
+
+
+def _take(iterator, n):
+    return list(islice(iterator, n))
+
+
+async def _iterate_async(iterator, chunk_size):
+    """Drive a blocking generator from asyncio, chunk_size items per hop.
+
+    Each stream gets its own worker thread (and so its own pooled
+    connection), so several streams can be consumed at once on one loop.
+    On cancellation or aclose() the generator is closed on that same
+    thread once any in-flight fetch finishes, without blocking the loop.
+    """
+    loop = asyncio.get_running_loop()
+    executor = ThreadPoolExecutor(max_workers=1)
+    try:
+        while True:
+            items = await loop.run_in_executor(
+                executor, _take, iterator, chunk_size)
+            if not items:
+                break
+            for item in items:
+                yield item
+    finally:
+        executor.submit(iterator.close)
+        executor.shutdown(wait=False)
+
+
+def async_stream_users(prefetch=None, chunk_size=500):
+    """async for counterpart of stream_users"""
+    return _iterate_async(stream_users(prefetch), chunk_size)
+
+
+def async_stream_users_in_batches(batch_size, **options):
+    """async for counterpart of stream_users_in_batches"""
+    return _iterate_async(stream_users_in_batches(batch_size, **options), 1)
+
+
+def async_lazy_pagination(page_size, resume_token=None, prefetch=0):
+    """async for counterpart of lazy_pagination"""
+    return _iterate_async(
+        lazy_pagination(page_size, resume_token, prefetch), 1)
+
+
+def async_stream_user_ages(chunk_size=5000):
+    """async for counterpart of stream_user_ages"""
+    return _iterate_async(stream_user_ages(), chunk_size)
+
+
+async def _main():
+    async def count_users():
+        return sum([1 async for _ in async_stream_users()])
+
+    async def total_age():
+        return sum([age async for age in async_stream_user_ages()])
+
+    users, ages = await asyncio.gather(count_users(), total_age())
+    print(f"Users: {users}, average age: {ages / users if users else 0:.2f}")
+
+
+if __name__ == "__main__":
+    asyncio.run(_main())
@@ -0,0 +1,166 @@
+# File: backends.py
+# ===============================
+import hashlib
+import os
+import re
+import sqlite3
+from functools import lru_cache
+
+SQLITE_PRAGMAS = (
+    "PRAGMA journal_mode = WAL",
+    "PRAGMA synchronous = NORMAL",
+    "PRAGMA mmap_size = 268435456",
+    "PRAGMA cache_size = -65536",
+    "PRAGMA temp_store = MEMORY",
+)
+
+_UPSERT = re.compile(r'\bON\s+DUPLICATE\s+KEY\s+UPDATE\b', re.I)
+
+
+def backend_name():
+    """Configured backend: DB_BACKEND=mysql (default) or sqlite"""
+    name = os.getenv('DB_BACKEND', 'mysql').lower()
+    if name not in ('mysql', 'sqlite'):
+        raise ValueError(f"Unsupported DB_BACKEND: {name}")
+    return name
+
+
+def sqlite_path():
+    """Database file used by the SQLite backend (SQLITE_PATH)"""
+    default = f"{os.getenv('DB_NAME', 'ALX_prodev')}.sqlite3"
+    return os.getenv('SQLITE_PATH', default)
+
+
+@lru_cache(maxsize=256)
+def translate(query):
+    """Rewrite the MySQL SQL used in this project into SQLite's dialect"""
+    query = query.replace('%s', '?')
+    query = re.sub(r'\bINSERT\s+IGNORE\b', 'INSERT OR IGNORE', query,
+                   flags=re.I)
+    query = re.sub(r'\bTRUNCATE\s+TABLE\b', 'DELETE FROM', query, flags=re.I)
+    parts = _UPSERT.split(query, maxsplit=1)
+    if len(parts) == 2:
+        head, tail = parts
+        tail = re.sub(r'\bVALUES\((\w+)\)', r'excluded.\1', tail, flags=re.I)
+        query = f"{head}ON CONFLICT DO UPDATE SET{tail}"
+    return query
+
+
+class _VarPop:
+    """VAR_POP aggregate (Welford) for SQLite"""
+
+    def __init__(self):
+        self.count, self.mean, self.m2 = 0, 0.0, 0.0
+
+    def step(self, value):
+        if value is None:
+            return
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (value - self.mean)
+
+    def finalize(self):
+        return self.m2 / self.count if self.count else None
+
+
+def _concat_ws(separator, *values):
+    return separator.join(str(value) for value in values if value is not None)
+
+
+def _md5(value):
+    return hashlib.md5(str(value).encode('utf-8')).hexdigest()
+
+
+class SQLiteCursor:
+    """mysql.connector-style cursor over sqlite3.
+
+    Accepts %s placeholders and the MySQL statements this project uses;
+    dictionary=True returns dict rows. SQLite cursors already step through
+    results lazily, so buffered is accepted and ignored.
+    """
+
+    def __init__(self, connection, dictionary=False, buffered=None):
+        self._cursor = connection.cursor()
+        if dictionary:
+            self._cursor.row_factory = _dict_row
+
+    def execute(self, query, params=()):
+        self._cursor.execute(translate(query), tuple(params or ()))
+
+    def executemany(self, query, rows):
+        self._cursor.executemany(translate(query), rows)
+
+    def fetchone(self):
+        return self._cursor.fetchone()
+
+    def fetchmany(self, size=1):
+        return self._cursor.fetchmany(size)
+
+    def fetchall(self):
+        return self._cursor.fetchall()
+
+    def __iter__(self):
+        return iter(self._cursor)
+
+    @property
+    def rowcount(self):
+        return self._cursor.rowcount
+
+    @property
+    def description(self):
+        return self._cursor.description
+
+    def close(self):
+        self._cursor.close()
+
+
+def _dict_row(cursor, row):
+    return {column[0]: value for column, value in zip(cursor.description, row)}
+
+
+class SQLiteConnection:
+    """mysql.connector-style connection wrapping sqlite3"""
+
+    def __init__(self, path):
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._open = True
+        for pragma in SQLITE_PRAGMAS:
+            self._connection.execute(pragma)
+        self._connection.create_function('MD5', 1, _md5, deterministic=True)
+        self._connection.create_function('UNHEX', 1, bytes.fromhex,
+                                         deterministic=True)
+        self._connection.create_function('CONCAT_WS', -1, _concat_ws,
+                                         deterministic=True)
+        self._connection.create_aggregate('VAR_POP', 1, _VarPop)
+
+    def cursor(self, dictionary=False, buffered=None):
+        return SQLiteCursor(self._connection, dictionary, buffered)
+
+    @property
+    def in_transaction(self):
+        return self._connection.in_transaction
+
+    def is_connected(self):
+        return self._open
+
+    def commit(self):
+        self._connection.commit()
+
+    def rollback(self):
+        self._connection.rollback()
+
+    def close(self):
+        self._open = False
+        self._connection.close()
+
+    shutdown = close
+
+
+def connect_sqlite():
+    """Open the SQLite database with WAL and memory-mapped I/O enabled"""
+    try:
+        return SQLiteConnection(sqlite_path())
+    except sqlite3.Error as err:
+        print(f"Error connecting to SQLite database: {err}")
+        return None
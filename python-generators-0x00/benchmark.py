@@ -0,0 +1,184 @@
+# File: benchmark.py
+# ===============================
+"""Benchmark the user streaming strategies.
+
+Seeds a scratch database (DB_NAME, default ALX_prodev_bench) with
+generated users, then runs every strategy at several batch/page sizes,
+each in a fresh process, and prints one JSON object per run:
+
+    python3 benchmark.py --rows 10000 100000 --sizes 100 1000 10000 > bench.jsonl
+
+--backend sqlite runs the same code against a local SQLite file, so no
+MySQL server is needed.
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import queue
+import random
+import resource
+import sys
+import tempfile
+import time
+import uuid
+from itertools import chain
+
+
+def _stream_users(size):
+    return __import__('0-stream_users').stream_users(prefetch=size)
+
+
+def _stream_users_in_batches(size):
+    batches = __import__('1-batch_processing').stream_users_in_batches(size)
+    return chain.from_iterable(batches)
+
+
+def _lazy_pagination(size):
+    pages = __import__('2-lazy_paginate').lazy_pagination(size)
+    return chain.from_iterable(pages)
+
+
+def _lazy_pagination_prefetch(size):
+    pages = __import__('2-lazy_paginate').lazy_pagination(size, prefetch=2)
+    return chain.from_iterable(pages)
+
+
+STRATEGIES = {
+    'stream_users': _stream_users,
+    'stream_users_in_batches': _stream_users_in_batches,
+    'lazy_pagination': _lazy_pagination,
+    'lazy_pagination_prefetch': _lazy_pagination_prefetch,
+}
+
+
+def generate_csv(path, rows, seed=42):
+    """Write `rows` reproducible fake users to a CSV file"""
+    rng = random.Random(seed)
+    domains = ('gmail.com', 'yahoo.com', 'hotmail.com', 'example.org')
+    with open(path, 'w') as file:
+        file.write('user_id,name,email,age\n')
+        for i in range(rows):
+            user_id = uuid.UUID(int=rng.getrandbits(128), version=4)
+            file.write(f"{user_id},User {i},user{i}@{rng.choice(domains)},"
+                       f"{rng.randint(18, 120)}\n")
+
+
+def seed_database(rows):
+    """Recreate user_data in the scratch database with `rows` users"""
+    import seed
+    connection = seed.connect_db()
+    seed.create_database(connection)
+    connection.close()
+    connection = seed.connect_to_prodev()
+    seed.create_table(connection)
+    cursor = connection.cursor()
+    cursor.execute("TRUNCATE TABLE user_data")
+    cursor.close()
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'users.csv')
+        generate_csv(path, rows)
+        seed.insert_data_bulk(connection, path, batch_size=5000)
+    connection.close()
+
+
+def _peak_rss():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+def _run_case(strategy, size, results):
+    try:
+        results.put(_measure(strategy, size))
+    except BaseException as err:
+        results.put({'error': f"{type(err).__name__}: {err}"})
+
+
+def _measure(strategy, size):
+    for module in ('0-stream_users', '1-batch_processing', '2-lazy_paginate'):
+        __import__(module)
+    start = time.perf_counter()
+    first_row = None
+    count = 0
+    for _ in STRATEGIES[strategy](size):
+        if first_row is None:
+            first_row = time.perf_counter() - start
+        count += 1
+    elapsed = time.perf_counter() - start
+    return {
+        'rows': count,
+        'seconds': round(elapsed, 6),
+        'rows_per_sec': round(count / elapsed, 1) if elapsed else 0.0,
+        'time_to_first_row': round(first_row or 0.0, 6),
+        'peak_rss_bytes': _peak_rss(),
+    }
+
+
+def run_case(strategy, size):
+    """Run one strategy in a fresh interpreter so RSS is measured alone.
+
+    Returns the measurements, or {'error': ...} if the run failed or the
+    worker died without reporting.
+    """
+    context = multiprocessing.get_context('spawn')
+    results = context.Queue()
+    worker = context.Process(target=_run_case,
+                             args=(strategy, size, results))
+    worker.start()
+    while True:
+        try:
+            result = results.get(timeout=1.0)
+            break
+        except queue.Empty:
+            if not worker.is_alive():
+                result = {'error': f"worker exited with code "
+                                   f"{worker.exitcode} without a result"}
+                break
+    worker.join()
+    return result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, nargs='+', default=[10000])
+    parser.add_argument('--sizes', type=int, nargs='+',
+                        default=[100, 1000, 10000])
+    parser.add_argument('--strategies', nargs='+', choices=STRATEGIES,
+                        default=list(STRATEGIES))
+    parser.add_argument('--backend', choices=('mysql', 'sqlite'),
+                        default=os.getenv('DB_BACKEND', 'mysql'))
+    parser.add_argument('--no-seed', action='store_true',
+                        help="reuse the rows already in the database")
+    args = parser.parse_args(argv)
+    os.environ.setdefault('DB_NAME', 'ALX_prodev_bench')
+    os.environ['DB_BACKEND'] = args.backend
+
+    for rows in args.rows:
+        if not args.no_seed:
+            seed_database(rows)
+        for strategy in args.strategies:
+            for size in args.sizes:
+                result = run_case(strategy, size)
+                record = {
+                    'strategy': strategy, 'size': size, 'table_rows': rows,
+                    'backend': args.backend,
+                    'database': os.environ['DB_NAME'],
+                    'python': platform.python_version(),
+                    'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+                    **result,
+                }
+                print(json.dumps(record), flush=True)
+                if 'error' in result:
+                    print(f"{strategy:<26} size={size:<6} "
+                          f"failed: {result['error']}", file=sys.stderr)
+                    continue
+                print(f"{strategy:<26} size={size:<6} "
+                      f"{result['rows_per_sec']:>10.0f} rows/s  "
+                      f"first row {result['time_to_first_row'] * 1000:.1f}ms"
+                      f"  peak {result['peak_rss_bytes'] / 2**20:.1f}MiB",
+                      file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,214 @@
+# File: export_users.py
+# ===============================
+import gzip
+import json
+import struct
+import sys
+import uuid
+import zlib
+from array import array
+
+stream_users = __import__('0-stream_users').stream_users
+stream_user_columns = __import__('1-batch_processing').stream_user_columns
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+MAGIC = b'UCOL\x01'
+COLUMNS = ('user_id', 'name', 'email', 'age')
+RAW, ZLIB = 0, 1
+UUID_IDS = 1
+
+
+def _encode_json(row):
+    if orjson is not None:
+        return orjson.dumps(row, default=str) + b'\n'
+    return (json.dumps(row, default=str, separators=(',', ':')) + '\n').encode()
+
+
+def export_ndjson(path, rows=None, compress=False):
+    """Write rows (default: stream_users()) as newline-delimited JSON.
+
+    Uses orjson when it is installed; compress=True gzips the output.
+    Returns the number of rows written.
+    """
+    rows = stream_users(prefetch=1000) if rows is None else rows
+    opener = gzip.open if compress else open
+    count = 0
+    with opener(path, 'wb') as out:
+        for row in rows:
+            out.write(_encode_json(row))
+            count += 1
+    return count
+
+
+def _le(values):
+    """array bytes in little-endian order regardless of the host"""
+    if sys.byteorder == 'big':
+        values = array(values.typecode, values)
+        values.byteswap()
+    return values.tobytes()
+
+
+def _from_le(typecode, data):
+    values = array(typecode)
+    values.frombytes(data)
+    if sys.byteorder == 'big':
+        values.byteswap()
+    return values
+
+
+def _encode_strings(values):
+    blobs = [value.encode('utf-8') for value in values]
+    ends, total = array('I'), 0
+    for blob in blobs:
+        total += len(blob)
+        ends.append(total)
+    return _le(ends) + b''.join(blobs)
+
+
+def _decode_strings(data, count):
+    ends = _from_le('I', data[:4 * count])
+    blob = data[4 * count:]
+    start, values = 0, []
+    for end in ends:
+        values.append(blob[start:end].decode('utf-8'))
+        start = end
+    return values
+
+
+def _encode_ids(values):
+    """16-byte UUIDs when every id is a canonical UUID string, else strings"""
+    try:
+        parsed = [uuid.UUID(value) for value in values]
+    except ValueError:
+        parsed = None
+    if parsed and all(str(u) == v for u, v in zip(parsed, values)):
+        return UUID_IDS, b''.join(u.bytes for u in parsed)
+    return 0, _encode_strings(values)
+
+
+def _write_block(out, payload, compress):
+    if compress:
+        payload, codec = zlib.compress(payload, 6), ZLIB
+    else:
+        codec = RAW
+    out.write(struct.pack('<BI', codec, len(payload)))
+    out.write(payload)
+
+
+def _read_block(src):
+    codec, length = struct.unpack('<BI', src.read(5))
+    payload = src.read(length)
+    return zlib.decompress(payload) if codec == ZLIB else payload
+
+
+def _split_email(email):
+    """(local part, '@domain'); the two concatenate back to email"""
+    at = email.rfind('@')
+    if at < 0:
+        at = len(email)
+    return email[:at], email[at:]
+
+
+def export_columnar(path, batch_size=65536, compress=True):
+    """Write user_data to a compact typed columnar file.
+
+    Each row group stores user_id as 16-byte UUIDs, name and the local part
+    of email as offset+blob string columns, the email @domain as integer
+    codes into a file-wide dictionary, and age as int32, each column
+    optionally zlib-compressed. Batches come straight from
+    stream_user_columns, so the table is never held in memory.
+    Returns the number of rows written.
+    """
+    domains = {}
+    count = 0
+    with open(path, 'wb') as out:
+        out.write(MAGIC)
+        for batch in stream_user_columns(batch_size, COLUMNS):
+            n = len(batch['user_id'])
+            flags, ids = _encode_ids(batch['user_id'])
+            local_parts, codes, new_domains = [], array('I'), []
+            for email in batch['email']:
+                local, domain = _split_email(email)
+                if domain not in domains:
+                    domains[domain] = len(domains)
+                    new_domains.append(domain)
+                local_parts.append(local)
+                codes.append(domains[domain])
+            out.write(struct.pack('<IBI', n, flags, len(new_domains)))
+            _write_block(out, _encode_strings(new_domains), compress)
+            _write_block(out, ids, compress)
+            _write_block(out, _encode_strings(batch['name']), compress)
+            _write_block(out, _encode_strings(local_parts), compress)
+            _write_block(out, _le(codes), compress)
+            _write_block(out, _le(array('i', batch['age'])), compress)
+            count += n
+        out.write(struct.pack('<IBI', 0, 0, 0))
+    return count
+
+
+def read_columnar(path):
+    """Yield user dicts back out of a file written by export_columnar"""
+    domains = []
+    with open(path, 'rb') as src:
+        if src.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"{path} is not a user_data columnar file")
+        while True:
+            n, flags, added = struct.unpack('<IBI', src.read(9))
+            if not n:
+                return
+            domains.extend(_decode_strings(_read_block(src), added))
+            ids = _read_block(src)
+            if flags & UUID_IDS:
+                user_ids = [str(uuid.UUID(bytes=ids[i:i + 16]))
+                            for i in range(0, 16 * n, 16)]
+            else:
+                user_ids = _decode_strings(ids, n)
+            names = _decode_strings(_read_block(src), n)
+            locals_ = _decode_strings(_read_block(src), n)
+            codes = _from_le('I', _read_block(src))
+            ages = _from_le('i', _read_block(src))
+            for i in range(n):
+                yield {'user_id': user_ids[i], 'name': names[i],
+                       'email': locals_[i] + domains[codes[i]],
+                       'age': ages[i]}
+
+
+def export_parquet(path, batch_size=65536, compression='zstd'):
+    """Write user_data to Parquet; needs the optional pyarrow package.
+
+    As in export_columnar, email is split into email_local and an
+    email_domain column (with its '@'); only the domain, which repeats
+    across rows, is dictionary-encoded. email_local + email_domain gives
+    the address back.
+    """
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise ImportError("export_parquet requires pyarrow: "
+                          "pip install pyarrow")
+    schema = pa.schema([('user_id', pa.string()), ('name', pa.string()),
+                        ('email_local', pa.string()),
+                        ('email_domain', pa.string()),
+                        ('age', pa.int32())])
+    count = 0
+    with pq.ParquetWriter(path, schema, compression=compression,
+                          use_dictionary=['email_domain']) as writer:
+        for batch in stream_user_columns(batch_size, COLUMNS):
+            locals_, domains = [], []
+            for email in batch['email']:
+                local, domain = _split_email(email)
+                locals_.append(local)
+                domains.append(domain)
+            table = pa.table({'user_id': list(batch['user_id']),
+                              'name': list(batch['name']),
+                              'email_local': locals_,
+                              'email_domain': domains,
+                              'age': list(batch['age'])}, schema=schema)
+            writer.write_table(table)
+            count += table.num_rows
+    return count
@@ -0,0 +1,90 @@
+# File: fast_csv.py
+# ===============================
+import csv
+import mmap
+import os
+from itertools import repeat
+from operator import eq
+
+BLOCK_SIZE = 64 * 1024
+
+
+def _blocks(mm, start, end, block_size):
+    """Yield newline-terminated byte blocks covering mm[start:end]"""
+    pos = start
+    while pos < end:
+        stop = min(pos + block_size, end)
+        if stop < end:
+            newline = mm.rfind(b'\n', pos, stop)
+            if newline < 0:
+                newline = mm.find(b'\n', stop, end)
+            stop = end if newline < 0 else newline + 1
+        yield mm[pos:stop]
+        pos = stop
+
+
+def _parse_block(block, width, picks, converters):
+    """Turn one block of CSV lines into a list of picked, converted tuples.
+
+    When every line has exactly width - 1 commas and no quotes, the block
+    is split into one flat list of fields and each requested column is a
+    strided slice of it - all C-level work. Anything else goes through
+    the csv module, and a row with the wrong number of fields raises
+    ValueError rather than shifting later columns.
+    """
+    text = block.decode('utf-8')
+    if '\r' in text:
+        text = text.replace('\r', '')
+    text = text.strip('\n')
+    if not text:
+        return []
+    lines = text.split('\n')
+    commas = map(str.count, lines, repeat(','))
+    if '"' not in text and all(map(eq, commas, repeat(width - 1))):
+        flat = text.replace('\n', ',').split(',')
+        columns = [flat[i::width] for i in picks]
+    else:
+        rows = list(filter(None, csv.reader(lines)))
+        for row in rows:
+            if len(row) != width:
+                raise ValueError(
+                    f"Expected {width} CSV fields, got {len(row)}: {row!r}")
+        columns = [[row[i] for row in rows] for i in picks]
+    for i, convert in converters:
+        columns[i] = map(convert, columns[i])
+    return list(zip(*columns))
+
+
+def scan_csv_batches(csv_file, columns, converters=None, batch_size=1000,
+                     start=None, end=None, block_size=BLOCK_SIZE):
+    """Yield batches of tuples for `columns`, read through a memory map.
+
+    The file is mapped rather than read line by line and parsed a block at
+    a time: each block is decoded once and split into fields in bulk, only
+    the requested columns are kept and converted column-wise (e.g.
+    converters={'age': int}), and rows are zipped together at the end. No
+    per-row dict or Python-level field loop is involved.
+    start/end restrict the scan to a byte range beginning on a line start.
+    """
+    if os.path.getsize(csv_file) == 0:
+        return
+    converters = converters or {}
+    with open(csv_file, 'rb') as file, \
+            mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        header_end = mm.find(b'\n') + 1 or len(mm)
+        header = next(csv.reader([mm[:header_end].decode('utf-8').strip()]))
+        picks = [header.index(col) for col in columns]
+        convert = [(i, converters[col]) for i, col in enumerate(columns)
+                   if col in converters]
+        start = header_end if start is None else max(start, header_end)
+        end = len(mm) if end is None else end
+        pending = []
+        for block in _blocks(mm, start, end, block_size):
+            pending.extend(_parse_block(block, len(header), picks, convert))
+            taken = 0
+            while len(pending) - taken >= batch_size:
+                yield pending[taken:taken + batch_size]
+                taken += batch_size
+            del pending[:taken]
+        if pending:
+            yield pending
@@ -0,0 +1,215 @@
+# File: instrumentation.py
+# ===============================
+import os
+import re
+import sys
+import threading
+from collections import defaultdict
+from contextlib import contextmanager
+from functools import lru_cache
+from time import perf_counter
+
+_listeners = []
+_lock = threading.Lock()
+
+_LITERALS = re.compile(r"'(?:[^'\\]|\\.|'')*'|\b\d+(?:\.\d+)?\b|%s|\?")
+
+
+def add_listener(listener):
+    """Register listener(event, data) for query events.
+
+    event is 'query' once a statement's results have been consumed, with
+    data holding source, fingerprint, rows, fetches and execute_seconds /
+    fetch_seconds / consumer_seconds; and 'summary' when the generator
+    running the statements exits, with the same fields added up over all
+    of its statements plus 'queries' and 'completed'.
+    """
+    with _lock:
+        _listeners.append(listener)
+
+
+def remove_listener(listener):
+    with _lock:
+        if listener in _listeners:
+            _listeners.remove(listener)
+
+
+@contextmanager
+def listening(listener):
+    """Register a listener for the duration of a with block"""
+    add_listener(listener)
+    try:
+        yield listener
+    finally:
+        remove_listener(listener)
+
+
+@lru_cache(maxsize=256)
+def fingerprint(query):
+    """Query shape: literals and placeholders become ?, whitespace collapsed"""
+    return ' '.join(_LITERALS.sub('?', query).split())
+
+
+def _emit(event, data):
+    for listener in list(_listeners):
+        try:
+            listener(event, data)
+        except Exception as err:
+            print(f"Error in query listener: {err}", file=sys.stderr)
+
+
+def _totals():
+    return {'rows': 0, 'fetches': 0, 'execute_seconds': 0.0,
+            'fetch_seconds': 0.0, 'consumer_seconds': 0.0}
+
+
+class TracedCursor:
+    """Cursor wrapper that times execute, fetch and the gaps between fetches.
+
+    The gap between one fetch returning and the next fetch (or execute)
+    is time the rows spent with the consumer of the generator.
+    """
+
+    def __init__(self, cursor, source):
+        self._cursor = cursor
+        self.source = source
+        self.summary = dict(_totals(), source=source, queries=0,
+                            completed=False)
+        self._query = None
+        self._returned = None
+
+    def _consumer_gap(self, now):
+        if self._returned is not None and self._query is not None:
+            self._query['consumer_seconds'] += now - self._returned
+        self._returned = None
+
+    def _finish_query(self):
+        if self._query is None:
+            return
+        for key, value in self._query.items():
+            if key in ('source', 'fingerprint'):
+                continue
+            self.summary[key] += value
+        _emit('query', self._query)
+        self._query = None
+
+    def execute(self, query, params=()):
+        self._consumer_gap(perf_counter())
+        self._finish_query()
+        start = perf_counter()
+        self._cursor.execute(query, params)
+        self._query = dict(_totals(), source=self.source,
+                           fingerprint=fingerprint(query))
+        self._query['execute_seconds'] = perf_counter() - start
+        self.summary['queries'] += 1
+
+    def _fetch(self, fetch, *args):
+        start = perf_counter()
+        self._consumer_gap(start)
+        result = fetch(*args)
+        self._returned = perf_counter()
+        if self._query is not None:
+            self._query['fetch_seconds'] += self._returned - start
+            self._query['fetches'] += 1
+            if isinstance(result, list):
+                self._query['rows'] += len(result)
+            elif result is not None:
+                self._query['rows'] += 1
+        return result
+
+    def fetchone(self):
+        return self._fetch(self._cursor.fetchone)
+
+    def fetchmany(self, size=1):
+        return self._fetch(self._cursor.fetchmany, size)
+
+    def fetchall(self):
+        return self._fetch(self._cursor.fetchall)
+
+    def __iter__(self):
+        rows = iter(self._cursor)
+        while True:
+            row = self._fetch(next, rows, None)
+            if row is None:
+                return
+            yield row
+
+    def close(self):
+        self._cursor.close()
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+    def finish(self, completed):
+        """Close out the last statement and emit the generator summary"""
+        self._consumer_gap(perf_counter())
+        self._finish_query()
+        self.summary['completed'] = completed
+        _emit('summary', self.summary)
+
+
+@contextmanager
+def traced(cursor, source):
+    """Yield `cursor`, instrumented if any listener is registered.
+
+    With no listeners the cursor is passed through untouched, so the only
+    cost is this check once per query. Otherwise the summary is emitted
+    when the block exits, including when a consumer abandons the generator.
+    """
+    if not _listeners:
+        yield cursor
+        return
+    cursor = TracedCursor(cursor, source)
+    completed = False
+    try:
+        yield cursor
+        completed = True
+    finally:
+        cursor.finish(completed)
+
+
+class QueryStats:
+    """Listener that aggregates 'query' events per source and query shape"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.by_query = defaultdict(lambda: dict(_totals(), queries=0))
+
+    def __call__(self, event, data):
+        if event != 'query':
+            return
+        with self._lock:
+            totals = self.by_query[(data['source'], data['fingerprint'])]
+            totals['queries'] += 1
+            for key in _totals():
+                totals[key] += data[key]
+
+    def report(self, file=None):
+        """Print one line per query shape, slowest first"""
+        def total(item):
+            _, t = item
+            return (t['execute_seconds'] + t['fetch_seconds']
+                    + t['consumer_seconds'])
+
+        for (source, shape), t in sorted(self.by_query.items(), key=total,
+                                         reverse=True):
+            print(f"{source:<20} x{t['queries']:<5} rows={t['rows']:<9} "
+                  f"execute={t['execute_seconds']:.3f}s "
+                  f"fetch={t['fetch_seconds']:.3f}s "
+                  f"consumer={t['consumer_seconds']:.3f}s  {shape}",
+                  file=file or sys.stderr)
+
+
+def print_summary(event, data):
+    """Listener printing each generator's summary to stderr"""
+    if event != 'summary':
+        return
+    state = 'done' if data['completed'] else 'stopped early'
+    print(f"[{data['source']}] {state}: {data['queries']} queries, "
+          f"{data['rows']} rows, execute {data['execute_seconds']:.3f}s, "
+          f"fetch {data['fetch_seconds']:.3f}s, "
+          f"consumer {data['consumer_seconds']:.3f}s", file=sys.stderr)
+
+
+if os.getenv('QUERY_TRACE'):
+    add_listener(print_summary)
@@ -0,0 +1,125 @@
+# File: partitioned_scan.py
+# ===============================
+import queue
+import threading
+from instrumentation import traced
+from pool import pooled_connection
+from seed import USER_COLUMNS
+
+_DONE = object()
+
+
+def key_ranges(partitions):
+    """Split user_data into `partitions` contiguous user_id ranges.
+
+    Boundaries are read from the primary key index, so the ranges hold
+    roughly equal row counts whatever the key distribution. Returns a list
+    of (low, high) pairs; low is inclusive, high exclusive, None is open.
+    """
+    with pooled_connection() as connection:
+        cursor = connection.cursor()
+        with traced(cursor, 'key_ranges') as cursor:
+            cursor.execute("SELECT COUNT(*) FROM user_data")
+            (total,) = cursor.fetchone()
+            bounds = set()
+            for i in range(1, partitions):
+                cursor.execute(
+                    "SELECT user_id FROM user_data ORDER BY user_id "
+                    "LIMIT 1 OFFSET %s", (total * i // partitions,))
+                row = cursor.fetchone()
+                if row:
+                    bounds.add(row[0])
+            cursor.close()
+    bounds = sorted(bounds)
+    return list(zip([None] + bounds, bounds + [None]))
+
+
+def scan_range(low, high, batch_size=1000):
+    """Yield batches of user dicts with low <= user_id < high, in key order"""
+    conditions, params = [], []
+    if low is not None:
+        conditions.append("user_id >= %s")
+        params.append(low)
+    if high is not None:
+        conditions.append("user_id < %s")
+        params.append(high)
+    query = f"SELECT {', '.join(USER_COLUMNS)} FROM user_data"
+    if conditions:
+        query += " WHERE " + " AND ".join(conditions)
+    with pooled_connection() as connection:
+        cursor = connection.cursor(dictionary=True, buffered=False)
+        with traced(cursor, 'scan_range') as cursor:
+            cursor.execute(query + " ORDER BY user_id", params)
+            batch = cursor.fetchmany(batch_size)
+            while batch:
+                yield batch
+                batch = cursor.fetchmany(batch_size)
+            cursor.close()
+
+
+def _offer(out, item, stop):
+    while not stop.is_set():
+        try:
+            out.put(item, timeout=0.1)
+            return True
+        except queue.Full:
+            continue
+    return False
+
+
+def _scan_into(low, high, batch_size, out, stop):
+    source = scan_range(low, high, batch_size)
+    try:
+        for batch in source:
+            if not _offer(out, batch, stop):
+                return
+        _offer(out, _DONE, stop)
+    except Exception as err:
+        _offer(out, err, stop)
+    finally:
+        source.close()
+
+
+def _drain(out, producers):
+    while producers:
+        item = out.get()
+        if item is _DONE:
+            producers -= 1
+        elif isinstance(item, Exception):
+            raise item
+        else:
+            yield item
+
+
+def partitioned_scan(partitions=4, ordered=False, batch_size=1000, buffer=4):
+    """Read user_data over `partitions` connections at once.
+
+    Each key range is scanned by its own thread on its own pooled
+    connection (size the pool to at least `partitions`). Unordered mode
+    yields batches as soon as any range produces one; ordered mode yields
+    ranges in key order while later ranges read ahead up to `buffer`
+    batches each.
+    """
+    ranges = key_ranges(partitions)
+    stop = threading.Event()
+    if ordered:
+        outs = [queue.Queue(maxsize=buffer) for _ in ranges]
+    else:
+        outs = [queue.Queue(maxsize=buffer * len(ranges))] * len(ranges)
+    workers = [
+        threading.Thread(target=_scan_into,
+                         args=(low, high, batch_size, out, stop), daemon=True)
+        for (low, high), out in zip(ranges, outs)
+    ]
+    for worker in workers:
+        worker.start()
+    try:
+        if ordered:
+            for out in outs:
+                yield from _drain(out, 1)
+        else:
+            yield from _drain(outs[0], len(workers))
+    finally:
+        stop.set()
+        for worker in workers:
+            worker.join()
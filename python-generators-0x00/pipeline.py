@@ -0,0 +1,159 @@
+# File: pipeline.py
+# ===============================
+import queue
+import threading
+from collections import deque
+from concurrent.futures import (FIRST_COMPLETED, ProcessPoolExecutor,
+                                ThreadPoolExecutor, wait)
+from itertools import islice
+
+_DONE = object()
+
+
+def map_stage(fn, items):
+    for item in items:
+        yield fn(item)
+
+
+def filter_stage(predicate, items):
+    for item in items:
+        if predicate(item):
+            yield item
+
+
+def batch(items, size):
+    """Group items into lists of up to `size`"""
+    items = iter(items)
+    chunk = list(islice(items, size))
+    while chunk:
+        yield chunk
+        chunk = list(islice(items, size))
+
+
+def window(items, size, step=1):
+    """Sliding windows (tuples) of `size` items, advancing `step` at a time"""
+    current = deque(maxlen=size)
+    # The first window ends at item size - 1, each later one step further
+    for index, item in enumerate(items):
+        current.append(item)
+        if index >= size - 1 and (index - size + 1) % step == 0:
+            yield tuple(current)
+
+
+def parallel_map(fn, items, workers=4, max_in_flight=None, processes=False,
+                 ordered=True):
+    """Apply fn on a thread (or process) pool with bounded fan-out.
+
+    At most `max_in_flight` items (default 2 * workers) are submitted
+    ahead of the consumer, so a slow consumer throttles the source instead
+    of buffering it. ordered=True yields results in input order; otherwise
+    as they complete. With processes=True, fn must be picklable - map over
+    batches rather than single rows to amortise the hand-off.
+    """
+    limit = max_in_flight or 2 * workers
+    pool_class = ProcessPoolExecutor if processes else ThreadPoolExecutor
+    items = iter(items)
+    with pool_class(max_workers=workers) as executor:
+        pending = deque(executor.submit(fn, item)
+                        for item in islice(items, limit))
+        try:
+            while pending:
+                if ordered:
+                    done = pending.popleft()
+                else:
+                    finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+                    done = finished.pop()
+                    pending.remove(done)
+                for item in islice(items, 1):
+                    pending.append(executor.submit(fn, item))
+                yield done.result()
+        finally:
+            for future in pending:
+                future.cancel()
+
+
+def _feed(sink, inbox, results, index):
+    finished = False
+
+    def drain():
+        nonlocal finished
+        while True:
+            item = inbox.get()
+            if item is _DONE:
+                finished = True
+                return
+            yield item
+
+    try:
+        results[index] = sink(drain())
+    except Exception as err:
+        results[index] = err
+    finally:
+        while not finished:
+            finished = inbox.get() is _DONE
+
+
+def tee(items, *sinks, buffer=64):
+    """Feed every item to each sink, running the sinks concurrently.
+
+    Each sink is a callable taking an iterator, run on its own thread with
+    a queue of `buffer` items; the source only advances once every queue
+    has room, so memory stays bounded by the slowest sink. Returns the
+    sinks' return values, re-raising the first sink error.
+    """
+    inboxes = [queue.Queue(maxsize=buffer) for _ in sinks]
+    results = [None] * len(sinks)
+    threads = [threading.Thread(target=_feed, args=(sink, inbox, results, i))
+               for i, (sink, inbox) in enumerate(zip(sinks, inboxes))]
+    for thread in threads:
+        thread.start()
+    try:
+        for item in items:
+            for inbox in inboxes:
+                inbox.put(item)
+    finally:
+        for inbox in inboxes:
+            inbox.put(_DONE)
+        for thread in threads:
+            thread.join()
+    for result in results:
+        if isinstance(result, Exception):
+            raise result
+    return results
+
+
+class Pipeline:
+    """Chainable wrapper over the stages, e.g.
+
+        Pipeline(stream_users()).filter(lambda u: u['age'] > 25) \\
+            .batch(500).parallel_map(score_batch, workers=8)
+    """
+
+    def __init__(self, source):
+        self._items = iter(source)
+
+    def map(self, fn):
+        self._items = map_stage(fn, self._items)
+        return self
+
+    def filter(self, predicate):
+        self._items = filter_stage(predicate, self._items)
+        return self
+
+    def batch(self, size):
+        self._items = batch(self._items, size)
+        return self
+
+    def window(self, size, step=1):
+        self._items = window(self._items, size, step)
+        return self
+
+    def parallel_map(self, fn, **options):
+        self._items = parallel_map(fn, self._items, **options)
+        return self
+
+    def tee(self, *sinks, buffer=64):
+        return tee(self._items, *sinks, buffer=buffer)
+
+    def __iter__(self):
+        return self._items
@@ -0,0 +1,206 @@
+# File: pool.py
+# ===============================
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from seed import connect_to_prodev
+
+
+class PoolTimeout(Exception):
+    """Raised when no connection frees up within the borrow timeout"""
+
+
+def _is_alive(connection):
+    return connection.is_connected()
+
+
+def _dispose(connection):
+    """Drop a connection without the clean-close checks.
+
+    shutdown() closes the socket even when a streamed result was left
+    unread, which close() refuses to do.
+    """
+    try:
+        if hasattr(connection, 'shutdown'):
+            connection.shutdown()
+        else:
+            connection.close()
+    except Exception:
+        pass
+
+
+class ConnectionPool:
+    """Thread-safe pool of reusable database connections.
+
+    Keeps up to `size` idle connections and lets `max_overflow` extra ones
+    be opened under load (closed again when returned). Borrowed connections
+    are health-checked, and ones that sat idle for more than `recycle`
+    seconds are replaced. Borrowers wait up to `timeout` seconds once the
+    pool is full.
+    """
+
+    def __init__(self, connect, size=5, max_overflow=5, timeout=30.0,
+                 recycle=3600.0, check=_is_alive):
+        self._connect = connect
+        self.size = size
+        self.max_overflow = max_overflow
+        self.timeout = timeout
+        self.recycle = recycle
+        self._check = check
+        self._idle = deque()
+        self._open = 0
+        self._lock = threading.Condition()
+        self._metrics = {
+            'borrows': 0, 'created': 0, 'recycled': 0, 'discarded': 0,
+            'failed_checks': 0, 'waits': 0, 'exhausted': 0,
+            'wait_time_total': 0.0, 'wait_time_max': 0.0,
+        }
+
+    def _new_connection(self):
+        try:
+            connection = self._connect()
+            if connection is None:
+                raise ConnectionError("Could not open a database connection")
+        except BaseException:
+            with self._lock:
+                self._open -= 1
+                self._lock.notify()
+            raise
+        with self._lock:
+            self._metrics['created'] += 1
+        return connection
+
+    def acquire(self):
+        """Borrow a connection, opening or waiting for one as needed"""
+        start = time.perf_counter()
+        waited = False
+        with self._lock:
+            while not self._idle and self._open >= self.size + self.max_overflow:
+                waited = True
+                remaining = self.timeout - (time.perf_counter() - start)
+                if remaining <= 0:
+                    self._metrics['exhausted'] += 1
+                    raise PoolTimeout(
+                        f"No connection available after {self.timeout}s")
+                self._lock.wait(remaining)
+            self._metrics['borrows'] += 1
+            if waited:
+                wait = time.perf_counter() - start
+                self._metrics['waits'] += 1
+                self._metrics['wait_time_total'] += wait
+                self._metrics['wait_time_max'] = max(
+                    self._metrics['wait_time_max'], wait)
+            if self._idle:
+                connection, created_at, returned_at = self._idle.pop()
+            else:
+                self._open += 1
+                connection = None
+        if connection is None:
+            return self._new_connection(), time.monotonic()
+        if time.monotonic() - returned_at > self.recycle:
+            reason = 'recycled'
+        elif self._check and not self._check(connection):
+            reason = 'failed_checks'
+        else:
+            return connection, created_at
+        with self._lock:
+            self._metrics[reason] += 1
+        _dispose(connection)
+        return self._new_connection(), time.monotonic()
+
+    def release(self, connection, created_at, discard=False):
+        """Return a borrowed connection; discarded ones are closed instead"""
+        if not discard and getattr(connection, 'in_transaction', True):
+            try:
+                connection.rollback()
+            except Exception:
+                discard = True
+        with self._lock:
+            if discard or len(self._idle) >= self.size:
+                self._open -= 1
+                if discard:
+                    self._metrics['discarded'] += 1
+                keep = False
+            else:
+                self._idle.append((connection, created_at, time.monotonic()))
+                keep = True
+            self._lock.notify()
+        if discard:
+            _dispose(connection)
+        elif not keep:
+            connection.close()
+
+    @contextmanager
+    def connection(self):
+        """Borrow a connection for the duration of a with block.
+
+        Leaving the block with an exception - including GeneratorExit when
+        a streaming generator is abandoned - discards the connection, since
+        it may hold an unread result or a broken transaction.
+        """
+        connection, created_at = self.acquire()
+        try:
+            yield connection
+        except BaseException:
+            self.release(connection, created_at, discard=True)
+            raise
+        self.release(connection, created_at)
+
+    def stats(self):
+        """Pool occupancy and wait/exhaustion metrics"""
+        with self._lock:
+            stats = dict(self._metrics)
+            stats.update(size=self.size, max_overflow=self.max_overflow,
+                         open=self._open, idle=len(self._idle),
+                         in_use=self._open - len(self._idle))
+        return stats
+
+    def close(self):
+        """Close every idle connection"""
+        with self._lock:
+            idle, self._idle = self._idle, deque()
+            self._open -= len(idle)
+        for connection, _, _ in idle:
+            _dispose(connection)
+
+
+_pool = None
+_pool_pid = None
+_pool_lock = threading.RLock()
+
+
+def configure_pool(**options):
+    """Replace the process-wide pool, e.g. configure_pool(size=10)"""
+    global _pool, _pool_pid
+    options.setdefault('connect', connect_to_prodev)
+    with _pool_lock:
+        if _pool is not None and _pool_pid == os.getpid():
+            _pool.close()
+        _pool = ConnectionPool(**options)
+        _pool_pid = os.getpid()
+    return _pool
+
+
+def get_pool():
+    """The process-wide pool every generator module borrows from.
+
+    Sized from DB_POOL_SIZE / DB_POOL_MAX_OVERFLOW / DB_POOL_TIMEOUT /
+    DB_POOL_RECYCLE. A forked child gets a fresh pool rather than sharing
+    its parent's sockets.
+    """
+    with _pool_lock:
+        if _pool is None or _pool_pid != os.getpid():
+            return configure_pool(
+                size=int(os.getenv('DB_POOL_SIZE', '5')),
+                max_overflow=int(os.getenv('DB_POOL_MAX_OVERFLOW', '5')),
+                timeout=float(os.getenv('DB_POOL_TIMEOUT', '30')),
+                recycle=float(os.getenv('DB_POOL_RECYCLE', '3600')),
+            )
+        return _pool
+
+
+def pooled_connection():
+    """Shortcut for get_pool().connection()"""
+    return get_pool().connection()
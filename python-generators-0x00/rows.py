@@ -0,0 +1,89 @@
+# File: rows.py
+# ===============================
+import sys
+import time
+import tracemalloc
+from collections import namedtuple
+from functools import lru_cache
+from seed import USER_COLUMNS
+
+
+class UserRecord:
+    """Slotted user row: attribute access, no per-row __dict__"""
+    __slots__ = USER_COLUMNS
+
+    def __init__(self, user_id, name, email, age):
+        self.user_id = user_id
+        self.name = name
+        self.email = email
+        self.age = age
+
+    def __repr__(self):
+        return (f"UserRecord(user_id={self.user_id!r}, name={self.name!r}, "
+                f"email={self.email!r}, age={self.age!r})")
+
+    def __eq__(self, other):
+        if not isinstance(other, UserRecord):
+            return NotImplemented
+        return all(getattr(self, col) == getattr(other, col)
+                   for col in USER_COLUMNS)
+
+
+@lru_cache(maxsize=None)
+def _named_row(columns):
+    return namedtuple('UserRow', columns)
+
+
+def make_row_factory(kind, columns=USER_COLUMNS):
+    """Return a callable turning a cursor tuple into a row, or None for dicts.
+
+    kind is 'dict' (the dictionary cursor, default), 'tuple' (a namedtuple
+    with attribute access by column name), 'record' (UserRecord, full rows
+    only) or 'plain' (the bare tuple). A callable is returned unchanged.
+    """
+    if kind is None or kind == 'dict':
+        return None
+    if callable(kind):
+        return kind
+    if kind == 'plain':
+        return tuple
+    if kind == 'tuple':
+        return _named_row(tuple(columns))._make
+    if kind == 'record':
+        if tuple(columns) != USER_COLUMNS:
+            raise ValueError("'record' rows need all user_data columns")
+        return lambda row: UserRecord(*row)
+    raise ValueError(f"Unknown row factory: {kind}")
+
+
+def measure_rows(count=200_000):
+    """Print memory per row and iteration time for each row representation"""
+    raw = [[f"{i:08d}-0000-4000-8000-000000000000", f"User {i}",
+            f"user{i}@example.com", 18 + i % 80] for i in range(count)]
+    builders = {
+        'dict': lambda row: dict(zip(USER_COLUMNS, row)),
+        'tuple': make_row_factory('tuple'),
+        'record': make_row_factory('record'),
+        'plain': tuple,
+    }
+    readers = {
+        'dict': lambda rows: sum(row['age'] for row in rows),
+        'tuple': lambda rows: sum(row.age for row in rows),
+        'record': lambda rows: sum(row.age for row in rows),
+        'plain': lambda rows: sum(row[3] for row in rows),
+    }
+    for kind, build in builders.items():
+        tracemalloc.start()
+        rows = [build(row) for row in raw]
+        size, _ = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        start = time.perf_counter()
+        readers[kind](rows)
+        elapsed = time.perf_counter() - start
+        print(f"{kind:<7} {size / count:7.1f} bytes/row (container only)  "
+              f"{elapsed / count * 1e9:6.1f} ns/row to iterate")
+        del rows
+
+
+if __name__ == "__main__":
+    measure_rows(int(sys.argv[1]) if len(sys.argv) > 1 else 200_000)
@@ -1,38 +1,77 @@
 import mysql.connector
 import csv
+import hashlib
+import multiprocessing
 import os
+import sqlite3
+import time
+from backends import backend_name, connect_sqlite
+from fast_csv import scan_csv_batches
+
+USER_COLUMNS = ('user_id', 'name', 'email', 'age')
+
+DB_ERRORS = (mysql.connector.Error, sqlite3.Error)
+
+INSERT_USER_SQL = """
+    INSERT IGNORE INTO user_data
+    (user_id, name, email, age)
+    VALUES (%s, %s, %s, %s)
+"""
+
+UPSERT_USER_SQL = """
+    INSERT INTO user_data
+    (user_id, name, email, age)
+    VALUES (%s, %s, %s, %s)
+    ON DUPLICATE KEY UPDATE
+    name = VALUES(name), email = VALUES(email), age = VALUES(age)
+"""
 
 def connect_db():
     """Connect to MySQL server without specifying a database"""
+    if backend_name() == 'sqlite':
+        return connect_sqlite()
     try:
         return mysql.connector.connect(
             host="localhost",
             user=os.getenv('DB_USER', 'root'),
             password=os.getenv('DB_PASSWORD', '')
         )
-    except mysql.connector.Error as err:
+    except DB_ERRORS as err:
         print(f"Error connecting to MySQL: {err}")
         return None
 
+def database_name():
+    """Target database, ALX_prodev unless DB_NAME says otherwise"""
+    return os.getenv('DB_NAME', 'ALX_prodev')
+
 def create_database(connection):
     """Create ALX_prodev database if it doesn't exist"""
+    if backend_name() == 'sqlite':
+        return
     try:
         cursor = connection.cursor()
-        cursor.execute("CREATE DATABASE IF NOT EXISTS ALX_prodev")
+        cursor.execute(f"CREATE DATABASE IF NOT EXISTS `{database_name()}`")
         cursor.close()
-    except mysql.connector.Error as err:
+    except DB_ERRORS as err:
         print(f"Error creating database: {err}")
 
-def connect_to_prodev():
-    """Connect to ALX_prodev database"""
+def connect_to_prodev(**options):
+    """Connect to ALX_prodev database, passing extra options to the driver.
+
+    With DB_BACKEND=sqlite this opens the local SQLite file instead (see
+    backends.py); driver options only apply to MySQL.
+    """
+    if backend_name() == 'sqlite':
+        return connect_sqlite()
     try:
         return mysql.connector.connect(
             host="localhost",
             user=os.getenv('DB_USER', 'root'),
             password=os.getenv('DB_PASSWORD', ''),
-            database="ALX_prodev"
+            database=database_name(),
+            **options
         )
-    except mysql.connector.Error as err:
+    except DB_ERRORS as err:
         print(f"Error connecting to ALX_prodev: {err}")
         return None
 
@@ -51,9 +90,39 @@ def create_table(connection):
         connection.commit()
         cursor.close()
         print("Table user_data created successfully")
-    except mysql.connector.Error as err:
+    except DB_ERRORS as err:
         print(f"Error creating table: {err}")
 
+def enable_change_tracking(connection):
+    """Add an auto-maintained updated_at column (and index) to user_data.
+
+    Every INSERT or UPDATE stamps the row, which lets incremental_sync read
+    only rows changed since its last checkpoint. Safe to run repeatedly.
+    """
+    if backend_name() == 'sqlite':
+        print("Error enabling change tracking: needs the MySQL backend")
+        return
+    try:
+        cursor = connection.cursor()
+        cursor.execute("""
+            SELECT COUNT(*) FROM INFORMATION_SCHEMA.COLUMNS
+            WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'user_data'
+            AND COLUMN_NAME = 'updated_at'
+        """)
+        (present,) = cursor.fetchone()
+        if not present:
+            cursor.execute("""
+                ALTER TABLE user_data
+                ADD COLUMN updated_at TIMESTAMP(6) NOT NULL
+                    DEFAULT CURRENT_TIMESTAMP(6)
+                    ON UPDATE CURRENT_TIMESTAMP(6),
+                ADD INDEX idx_user_data_updated_at (updated_at, user_id)
+            """)
+        connection.commit()
+        cursor.close()
+    except DB_ERRORS as err:
+        print(f"Error enabling change tracking: {err}")
+
 def insert_data(connection, csv_file):
     """Insert data from CSV file into user_data table"""
     try:
@@ -68,5 +137,204 @@ def insert_data(connection, csv_file):
                 """, (row['user_id'], row['name'], row['email'], int(row['age'])))
         connection.commit()
         cursor.close()
-    except (mysql.connector.Error, FileNotFoundError) as err:
-        print(f"Error inserting data: {err}")
\ No newline at end of file
+    except (*DB_ERRORS, FileNotFoundError) as err:
+        print(f"Error inserting data: {err}")
+
+def read_csv_batches(csv_file, batch_size=1000):
+    """Yield lists of (user_id, name, email, age) tuples read from CSV file"""
+    return scan_csv_batches(csv_file, USER_COLUMNS, {'age': int}, batch_size)
+
+def _report(stats, label):
+    """Fill in rows/sec for ingest stats and print a summary line"""
+    seconds = stats['seconds']
+    stats['rows_per_sec'] = stats['rows'] / seconds if seconds else 0.0
+    failed = f", {stats['failed']} failed" if stats.get('failed') else ''
+    print(f"{label}: {stats['rows']} rows in {seconds:.2f}s "
+          f"({stats['rows_per_sec']:.0f} rows/sec){failed}")
+    return stats
+
+def _insert_batches(connection, batches, progress=None):
+    """Run executemany/commit for each batch and return ingest stats.
+
+    If a batch fails, the error message is kept in stats['error'].
+    """
+    stats = {'rows': 0, 'batches': 0, 'seconds': 0.0}
+    start = time.perf_counter()
+    try:
+        cursor = connection.cursor()
+        for batch in batches:
+            cursor.executemany(INSERT_USER_SQL, batch)
+            connection.commit()
+            stats['rows'] += len(batch)
+            stats['batches'] += 1
+            if progress:
+                progress(stats['rows'], time.perf_counter() - start)
+        cursor.close()
+    except (*DB_ERRORS, FileNotFoundError) as err:
+        print(f"Error inserting data: {err}")
+        stats['error'] = str(err)
+    stats['seconds'] = time.perf_counter() - start
+    return stats
+
+def insert_data_bulk(connection, csv_file, batch_size=1000, progress=None):
+    """Insert CSV data in multi-row executemany batches.
+
+    One round trip and one commit per batch instead of per row.
+    progress, if given, is called as progress(rows_done, elapsed_seconds)
+    after every batch. Returns a stats dict with rows, seconds, rows_per_sec.
+    """
+    stats = _insert_batches(
+        connection, read_csv_batches(csv_file, batch_size), progress)
+    return _report(stats, "Bulk insert")
+
+def shard_csv(csv_file, shards):
+    """Split the CSV body into byte ranges that start on line boundaries.
+
+    Returns (header, ranges) where ranges is a list of (start, end) offsets.
+    Assumes no quoted field contains a newline, which holds for user_data.
+    """
+    size = os.path.getsize(csv_file)
+    with open(csv_file, 'rb') as file:
+        header = next(csv.reader([file.readline().decode('utf-8')]))
+        bounds = [file.tell()]
+        for i in range(1, shards):
+            target = bounds[0] + (size - bounds[0]) * i // shards
+            file.seek(max(target - 1, bounds[-1]))
+            file.readline()
+            bounds.append(max(file.tell(), bounds[-1]))
+        bounds.append(size)
+    ranges = [(start, end) for start, end in zip(bounds, bounds[1:])
+              if end > start]
+    return header, ranges
+
+def _ingest_shard(args):
+    """Worker process: parse one byte range and insert it on its own connection"""
+    csv_file, start, end, batch_size = args
+    connection = connect_to_prodev()
+    if connection is None:
+        return {'rows': 0, 'batches': 0, 'seconds': 0.0, 'failed': True,
+                'error': "could not connect", 'range': (start, end)}
+    batches = scan_csv_batches(csv_file, USER_COLUMNS, {'age': int},
+                               batch_size, start=start, end=end)
+    stats = _insert_batches(connection, batches)
+    connection.close()
+    stats['failed'] = 'error' in stats
+    stats['range'] = (start, end)
+    return stats
+
+def insert_data_parallel(csv_file, workers=None, batch_size=1000):
+    """Insert CSV data from several processes, one shard and connection each.
+
+    The file is split into line-aligned byte ranges, so each worker parses
+    only its own part. Returns merged stats with per-shard details in 'shards'
+    and the number of shards that could not connect or stopped on an error
+    in 'failed'; their rows are missing from the load.
+    """
+    start = time.perf_counter()
+    try:
+        _, ranges = shard_csv(csv_file, workers or os.cpu_count() or 1)
+    except (FileNotFoundError, StopIteration) as err:
+        print(f"Error inserting data: {err}")
+        return {'rows': 0, 'batches': 0, 'seconds': 0.0, 'shards': [],
+                'failed': 0}
+    jobs = [(csv_file, s, e, batch_size) for s, e in ranges]
+    with multiprocessing.Pool(len(jobs) or 1) as pool:
+        shards = pool.map(_ingest_shard, jobs)
+    stats = {
+        'rows': sum(shard['rows'] for shard in shards),
+        'batches': sum(shard['batches'] for shard in shards),
+        'seconds': time.perf_counter() - start,
+        'shards': shards,
+        'failed': sum(1 for shard in shards if shard['failed']),
+    }
+    return _report(stats, f"Parallel insert ({len(shards)} shards)")
+
+def load_data_infile(connection, csv_file):
+    """Load CSV file with LOAD DATA LOCAL INFILE, the server-side fast path.
+
+    The connection must be opened with allow_local_infile=True, e.g.
+    connect_to_prodev(allow_local_infile=True), and the server must have
+    local_infile enabled. The SQLite backend has no LOAD DATA and falls
+    back to insert_data_bulk.
+    """
+    if backend_name() == 'sqlite':
+        return insert_data_bulk(connection, csv_file, batch_size=10000)
+    stats = {'rows': 0, 'batches': 1, 'seconds': 0.0}
+    start = time.perf_counter()
+    try:
+        with open(csv_file, 'r', newline='') as file:
+            header = next(csv.reader(file))
+        columns = ', '.join(
+            col if col in USER_COLUMNS else '@skip' for col in header)
+        cursor = connection.cursor()
+        cursor.execute(f"""
+            LOAD DATA LOCAL INFILE %s
+            IGNORE INTO TABLE user_data
+            FIELDS TERMINATED BY ',' OPTIONALLY ENCLOSED BY '"'
+            LINES TERMINATED BY '\\n'
+            IGNORE 1 LINES
+            ({columns})
+        """, (os.path.abspath(csv_file),))
+        stats['rows'] = cursor.rowcount
+        connection.commit()
+        cursor.close()
+    except (*DB_ERRORS, FileNotFoundError, StopIteration) as err:
+        print(f"Error loading data: {err}")
+    stats['seconds'] = time.perf_counter() - start
+    return _report(stats, "LOAD DATA")
+
+def row_hash(name, email, age):
+    """Content hash of a user row; matches load_row_hashes' MD5 in SQL"""
+    return hashlib.md5(f"{name}\x1f{email}\x1f{age}".encode('utf-8')).digest()
+
+def load_row_hashes(connection):
+    """Read {user_id: row_hash} for every stored user in one pass"""
+    cursor = connection.cursor()
+    cursor.execute("""
+        SELECT user_id, UNHEX(MD5(CONCAT_WS(CHAR(31), name, email, age)))
+        FROM user_data
+    """)
+    hashes = {user_id: bytes(digest) for user_id, digest in cursor}
+    cursor.close()
+    return hashes
+
+def reseed_data(connection, csv_file, batch_size=1000, progress=None):
+    """Bring user_data in line with the CSV, touching only changed rows.
+
+    Loads every stored row's content hash once, skips CSV rows whose hash
+    is unchanged without sending them, and upserts new or changed rows in
+    executemany batches with ON DUPLICATE KEY UPDATE. Rows missing from
+    the CSV are left alone. Returns stats with rows, inserted, updated and
+    unchanged counts.
+    """
+    stats = {'rows': 0, 'inserted': 0, 'updated': 0, 'unchanged': 0,
+             'batches': 0, 'seconds': 0.0}
+    start = time.perf_counter()
+    try:
+        hashes = load_row_hashes(connection)
+        cursor = connection.cursor()
+        for batch in read_csv_batches(csv_file, batch_size):
+            changed = []
+            for row in batch:
+                digest = row_hash(*row[1:])
+                known = hashes.get(row[0])
+                if known == digest:
+                    stats['unchanged'] += 1
+                    continue
+                stats['updated' if known else 'inserted'] += 1
+                hashes[row[0]] = digest
+                changed.append(row)
+            if changed:
+                cursor.executemany(UPSERT_USER_SQL, changed)
+                connection.commit()
+                stats['batches'] += 1
+            stats['rows'] += len(batch)
+            if progress:
+                progress(stats['rows'], time.perf_counter() - start)
+        cursor.close()
+    except (*DB_ERRORS, FileNotFoundError) as err:
+        print(f"Error reseeding data: {err}")
+    stats['seconds'] = time.perf_counter() - start
+    return _report(stats, f"Reseed ({stats['inserted']} inserted, "
+                          f"{stats['updated']} updated, "
+                          f"{stats['unchanged']} unchanged)")
\ No newline at end of file
@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""Tests for the memory-mapped CSV scanner.
+"""
+import csv
+import io
+import os
+import tempfile
+import unittest
+
+from fast_csv import scan_csv_batches
+
+HEADER = b'user_id,name,email,age\n'
+COLUMNS = ('user_id', 'name', 'email', 'age')
+
+
+class TestScanCsvBatches(unittest.TestCase):
+    """Tests `scan_csv_batches`."""
+
+    def write(self, data):
+        """Write data to a temporary CSV file and return its path"""
+        handle, path = tempfile.mkstemp(suffix='.csv')
+        with os.fdopen(handle, 'wb') as file:
+            file.write(data)
+        self.addCleanup(os.remove, path)
+        return path
+
+    def scan(self, data, **options):
+        """All rows scan_csv_batches reads from data, flattened"""
+        path = self.write(data)
+        return [row for batch in scan_csv_batches(path, COLUMNS, **options)
+                for row in batch]
+
+    def reference(self, data):
+        """The rows csv.reader reads from data, header and blanks dropped"""
+        text = data.decode('utf-8')
+        rows = list(csv.reader(io.StringIO(text, newline='')))
+        return [tuple(row) for row in rows[1:] if row]
+
+    def test_matches_csv_reader(self) -> None:
+        """Plain rows, across many small blocks, match csv.reader."""
+        data = HEADER + b''.join(
+            b'id-%d,User %d,u%d@example.com,%d\n' % (i, i, i, 20 + i % 60)
+            for i in range(500))
+        self.assertEqual(self.scan(data, block_size=256),
+                         self.reference(data))
+
+    def test_quoted_commas(self) -> None:
+        """Quoted fields may contain commas and escaped quotes."""
+        data = HEADER + (b'1,"Doe, John",j@x.com,30\n'
+                         b'2,"Say ""hi""",s@x.com,41\n'
+                         b'3,Plain,p@x.com,52\n')
+        rows = self.scan(data)
+        self.assertEqual(rows, self.reference(data))
+        self.assertEqual(rows[0][1], 'Doe, John')
+        self.assertEqual(rows[1][1], 'Say "hi"')
+
+    def test_crlf(self) -> None:
+        """CRLF line endings give the same rows as LF."""
+        lf = HEADER + b'1,Ann,a@x.com,30\n2,Bob,b@x.com,40\n'
+        crlf = lf.replace(b'\n', b'\r\n')
+        self.assertEqual(self.scan(crlf), self.scan(lf))
+        self.assertEqual(self.scan(crlf), self.reference(crlf))
+
+    def test_no_trailing_newline(self) -> None:
+        """The last row is read even without a final newline."""
+        data = HEADER + b'1,Ann,a@x.com,30\n2,Bob,b@x.com,40'
+        self.assertEqual(self.scan(data), self.reference(data))
+        self.assertEqual(len(self.scan(data)), 2)
+
+    def test_blank_lines_skipped(self) -> None:
+        """Blank lines, like csv.reader's empty rows, are dropped."""
+        data = HEADER + b'1,Ann,a@x.com,30\n\n2,Bob,b@x.com,40\n'
+        self.assertEqual(self.scan(data), self.reference(data))
+
+    def test_ragged_lines_raise(self) -> None:
+        """A row with too few or too many fields raises ValueError."""
+        for line in (b'2,Bob,40\n', b'2,Bob,b@x.com,40,extra\n',
+                     b'2,"Bob, Jr",40\n'):
+            data = HEADER + b'1,Ann,a@x.com,30\n' + line
+            with self.subTest(line=line):
+                with self.assertRaises(ValueError):
+                    self.scan(data)
+
+    def test_picks_and_converts_columns(self) -> None:
+        """Only requested columns are returned, in requested order."""
+        path = self.write(HEADER + b'1,Ann,a@x.com,30\n2,Bob,b@x.com,40\n')
+        batches = list(scan_csv_batches(path, ('age', 'name'),
+                                        {'age': int}, batch_size=1))
+        self.assertEqual(batches, [[(30, 'Ann')], [(40, 'Bob')]])
+
+    def test_byte_range(self) -> None:
+        """start/end on line boundaries read just the rows between them."""
+        lines = [b'%d,User %d,u%d@x.com,%d\n' % (i, i, i, 30 + i)
+                 for i in range(10)]
+        data = HEADER + b''.join(lines)
+        start = len(HEADER) + sum(map(len, lines[:3]))
+        end = start + sum(map(len, lines[3:7]))
+        rows = self.scan(data, start=start, end=end)
+        self.assertEqual(rows, self.reference(data)[3:7])
+
+    def test_byte_ranges_cover_file(self) -> None:
+        """Adjacent ranges together read every row exactly once."""
+        lines = [b'%d,User %d,u%d@x.com,%d\n' % (i, i, i, 30 + i)
+                 for i in range(10)]
+        data = HEADER + b''.join(lines)
+        middle = len(HEADER) + sum(map(len, lines[:5]))
+        rows = (self.scan(data, end=middle)
+                + self.scan(data, start=middle))
+        self.assertEqual(rows, self.reference(data))
+
+    def test_empty_file(self) -> None:
+        """An empty file yields no batches."""
+        self.assertEqual(self.scan(b''), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
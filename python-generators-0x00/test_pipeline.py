@@ -0,0 +1,38 @@
+#!/usr/bin/env python3
+"""Tests for the pipeline stages.
+"""
+import unittest
+
+from pipeline import window
+
+
+class TestWindow(unittest.TestCase):
+    """Tests the `window` stage."""
+
+    def test_sliding(self) -> None:
+        """step=1 yields every overlapping window."""
+        self.assertEqual(list(window(range(1, 5), 2)),
+                         [(1, 2), (2, 3), (3, 4)])
+
+    def test_step_smaller_than_size(self) -> None:
+        """Windows overlap by size - step items."""
+        self.assertEqual(list(window(range(1, 8), 3, step=2)),
+                         [(1, 2, 3), (3, 4, 5), (5, 6, 7)])
+
+    def test_step_equal_to_size(self) -> None:
+        """step == size gives back-to-back windows."""
+        self.assertEqual(list(window(range(1, 7), 2, step=2)),
+                         [(1, 2), (3, 4), (5, 6)])
+
+    def test_step_larger_than_size(self) -> None:
+        """The first window comes right away, then skips step - size."""
+        self.assertEqual(list(window(range(1, 12), 2, step=3)),
+                         [(1, 2), (4, 5), (7, 8), (10, 11)])
+
+    def test_too_short(self) -> None:
+        """Fewer than size items yield nothing."""
+        self.assertEqual(list(window([1], 2)), [])
+
+
+if __name__ == '__main__':
+    unittest.main()